@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import METRICS
+
+# --- KONFIGURASI CACHE ANALISA ---
+CACHE_PATH = os.environ.get("KIF_CACHE_PATH", "kif_cache.sqlite3")
+CACHE_TTL = int(os.environ.get("KIF_CACHE_TTL", str(24 * 3600)))  # saat
+CACHE_MAX_ROWS = int(os.environ.get("KIF_CACHE_MAX_ROWS", "5000"))
+
+
+def normalize_prompt(prompt):
+    # Buang beza ruang kosong/indentasi supaya prompt yang sama menghasilkan kunci yang sama
+    return " ".join(prompt.split())
+
+
+def cache_key(prompt, engine, model):
+    raw = "\x1f".join([engine, model, normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def verdict_key(item_key, engine, model):
+    raw = "\x1f".join([engine, model, item_key])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    # Cache analisa LLM dalam SQLite: kekal selepas app dimulakan semula,
+    # dikongsi antara sesi, dengan had masa (TTL) dan had bilangan baris.
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_rows=CACHE_MAX_ROWS):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    key TEXT PRIMARY KEY,
+                    engine TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_accessed ON analysis_cache (accessed_at)")
+            # Keputusan per isu (satu baris bagi setiap GUID/pautan berita)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS verdict_cache (
+                    key TEXT PRIMARY KEY,
+                    verdict TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_verdict_cache_accessed ON verdict_cache (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, prompt, engine, model, record=True):
+        key = cache_key(prompt, engine, model)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+                if record:
+                    self.misses += 1
+                return None
+            conn.execute("UPDATE analysis_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            if record:
+                self.hits += 1
+            return row[0]
+
+    def put(self, prompt, engine, model, response):
+        key = cache_key(prompt, engine, model)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, engine, model, response, now, now)
+            )
+            conn.execute("DELETE FROM analysis_cache WHERE created_at < ?", (now - self.ttl,))
+            # Buang baris yang paling lama tidak diakses jika melebihi had saiz
+            conn.execute("""
+                DELETE FROM analysis_cache WHERE key IN (
+                    SELECT key FROM analysis_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_rows,))
+
+    def get_verdicts(self, item_keys, engine, model, record=True):
+        # Pulangkan senarai sejajar dengan item_keys; None bagi isu yang belum dianalisa
+        keys = [verdict_key(item_key, engine, model) for item_key in item_keys]
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            rows = dict(conn.execute(
+                f"SELECT key, verdict FROM verdict_cache WHERE created_at >= ? AND key IN ({','.join('?' * len(keys))})",
+                [now - self.ttl] + keys
+            ).fetchall()) if keys else {}
+            conn.executemany(
+                "UPDATE verdict_cache SET accessed_at = ? WHERE key = ?",
+                [(now, key) for key in rows]
+            )
+            if record:
+                self.hits += len(rows)
+                self.misses += len(keys) - len(rows)
+        return [json.loads(rows[key]) if key in rows else None for key in keys]
+
+    def record_hits(self, count):
+        # Hit yang dibaca dengan record=False tetapi benar-benar digunakan (tiada panggilan LLM)
+        with self._lock:
+            self.hits += count
+
+    def put_verdict(self, item_key, engine, model, verdict):
+        key = verdict_key(item_key, engine, model)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO verdict_cache VALUES (?, ?, ?, ?)",
+                (key, json.dumps(verdict, ensure_ascii=False), now, now)
+            )
+            conn.execute("DELETE FROM verdict_cache WHERE created_at < ?", (now - self.ttl,))
+            conn.execute("""
+                DELETE FROM verdict_cache WHERE key IN (
+                    SELECT key FROM verdict_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_rows,))
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM analysis_cache")
+            conn.execute("DELETE FROM verdict_cache")
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            # size = keputusan per isu (unit yang dikira hit/miss); responses = respons penuh per prompt
+            size = conn.execute("SELECT COUNT(*) FROM verdict_cache").fetchone()[0]
+            responses = conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "responses": responses,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+ANALYSIS_CACHE = AnalysisCache()
+METRICS.register_source("analysis_cache", ANALYSIS_CACHE.stats)
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import threading
+import time
+
+from metrics import METRICS
+
+# --- ENJIN AI ---
+GEMINI = "Gemini (Google)"
+CHATGPT = "ChatGPT (OpenAI)"
+DEEPSEEK = "DeepSeek"
+ENGINES = [GEMINI, CHATGPT, DEEPSEEK]
+AUTO = "Auto (Hedging)"  # hantar ke enjin utama, sandaran ke enjin lain jika lambat/gagal
+
+DEFAULT_MODELS = {
+    GEMINI: "gemini-2.0-flash",
+    CHATGPT: "gpt-4o-mini",
+    DEEPSEEK: "deepseek-chat",
+}
+# Boleh ditukar ke pelayan serasi OpenAI yang lain (cth. pelayan palsu bench/ untuk penanda aras)
+BASE_URLS = {
+    CHATGPT: os.environ.get("KIF_OPENAI_BASE_URL") or None,
+    DEEPSEEK: os.environ.get("KIF_DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
+}
+
+CLIENT_IDLE_TTL = int(os.environ.get("KIF_CLIENT_IDLE_TTL", "600"))  # saat
+MODEL_LIST_TTL = int(os.environ.get("KIF_MODEL_LIST_TTL", "3600"))  # saat
+
+
+def key_hash(api_key):
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class ClientPool:
+    # Satu klien bagi setiap (enjin, hash kunci API, base_url) untuk seluruh proses supaya
+    # sambungan HTTP/TLS digunakan semula antara panggilan. Klien yang lama tidak digunakan ditutup.
+
+    def __init__(self, idle_ttl=CLIENT_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self._clients = {}  # key -> [client, last_used]
+        self._lock = threading.Lock()
+
+    def get(self, engine, api_key):
+        base_url = BASE_URLS.get(engine)
+        key = (engine, key_hash(api_key), base_url)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            item = self._clients.get(key)
+            if item is None:
+                item = [self._create(engine, api_key, base_url), now]
+                self._clients[key] = item
+            item[1] = now
+            return item[0]
+
+    def _create(self, engine, api_key, base_url):
+        # SDK diimport hanya bila enjin itu digunakan kali pertama (import kedua-duanya ~1 s)
+        if engine == GEMINI:
+            from google import genai
+            return genai.Client(api_key=api_key)
+        if engine in (CHATGPT, DEEPSEEK):
+            from openai import OpenAI
+            # Cubaan semula dikendalikan oleh penjadual (rate_limit.py), bukan SDK
+            return OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        raise ValueError(f"Enjin AI tidak dikenali: {engine}")
+
+    def _evict_idle(self, now):
+        for key, (client, last_used) in list(self._clients.items()):
+            if now - last_used > self.idle_ttl:
+                del self._clients[key]
+                close = getattr(client, "close", None)
+                if close is not None:
+                    try:
+                        close()
+                    except Exception:
+                        pass
+
+    def clear(self):
+        with self._lock:
+            self._evict_idle(float("inf"))
+
+    def __len__(self):
+        return len(self._clients)
+
+
+CLIENT_POOL = ClientPool()
+
+_model_lists = {}  # (enjin, hash kunci) -> (masa, senarai nama model)
+_model_lists_lock = threading.Lock()
+
+
+def list_models(engine, api_key, ttl=MODEL_LIST_TTL):
+    key = (engine, key_hash(api_key))
+    with _model_lists_lock:
+        cached = _model_lists.get(key)
+        if cached is not None and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+
+    client = CLIENT_POOL.get(engine, api_key)
+    if engine == GEMINI:
+        names = [m.name for m in client.models.list()]
+    else:
+        names = sorted(m.id for m in client.models.list())
+    with _model_lists_lock:
+        _model_lists[key] = (time.monotonic(), names)
+    return names
+
+
+def _json_options(engine, json_mode):
+    # Mod JSON: Gemini guna response_mime_type, OpenAI/DeepSeek guna response_format json_object
+    if not json_mode:
+        return {}
+    if engine == GEMINI:
+        return {"config": {"response_mime_type": "application/json"}}
+    return {"response_format": {"type": "json_object"}}
+
+
+def _record_usage(engine, model, input_tokens, output_tokens):
+    METRICS.incr("llm_calls", engine=engine, model=model)
+    if input_tokens:
+        METRICS.incr("llm_input_tokens", input_tokens, engine=engine, model=model)
+    if output_tokens:
+        METRICS.incr("llm_output_tokens", output_tokens, engine=engine, model=model)
+
+
+def _usage_tokens(engine, response):
+    # Gemini: usage_metadata (prompt/candidates_token_count); OpenAI/DeepSeek: usage (prompt/completion_tokens)
+    if engine == GEMINI:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return None
+        return usage.prompt_token_count, usage.candidates_token_count
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return usage.prompt_tokens, usage.completion_tokens
+
+
+def generate(engine, api_key, model, prompt, json_mode=False):
+    client = CLIENT_POOL.get(engine, api_key)
+    with METRICS.timer("llm", engine=engine, model=model):
+        if engine == GEMINI:
+            response = client.models.generate_content(model=model, contents=prompt, **_json_options(engine, json_mode))
+            text = response.text
+        else:
+            response = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                **_json_options(engine, json_mode)
+            )
+            text = response.choices[0].message.content
+    _record_usage(engine, model, *(_usage_tokens(engine, response) or (None, None)))
+    return text
+
+
+class StreamCancelled(Exception):
+    pass
+
+
+def _stream_chunks(engine, stream, usage):
+    # Teks setiap bahagian strim; penggunaan token (jika dihantar oleh penyedia) disimpan dalam usage
+    for chunk in stream:
+        tokens = _usage_tokens(engine, chunk)
+        if tokens is not None:
+            usage[:] = tokens
+        if engine == GEMINI:
+            yield chunk.text
+        elif chunk.choices:
+            yield chunk.choices[0].delta.content
+
+
+def generate_stream(engine, api_key, model, prompt, on_chunk=None, cancel_event=None, stats=None, json_mode=False):
+    # Respons dihantar sebahagian demi sebahagian; stats diisi dengan masa token pertama (ttft)
+    # dan token terakhir (ttlt) dalam saat. Strim ditutup serta-merta bila cancel_event diset.
+    started = time.monotonic()
+    client = CLIENT_POOL.get(engine, api_key)
+    if engine == GEMINI:
+        stream = client.models.generate_content_stream(model=model, contents=prompt, **_json_options(engine, json_mode))
+    else:
+        stream = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            stream_options={"include_usage": True},
+            **_json_options(engine, json_mode)
+        )
+    usage = [None, None]
+    chunks = _stream_chunks(engine, stream, usage)
+
+    parts = []
+    ttft = None
+    try:
+        for text in chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                raise StreamCancelled("Strim dibatalkan oleh pengguna")
+            if not text:
+                continue
+            if ttft is None:
+                ttft = time.monotonic() - started
+                METRICS.observe("llm_ttft", ttft, engine=engine, model=model)
+                if stats is not None and "ttft" not in stats:
+                    stats["ttft"] = ttft
+            parts.append(text)
+            if on_chunk is not None:
+                on_chunk(text)
+    finally:
+        # Menutup sambungan menghentikan penjanaan di pihak penyedia
+        chunks.close()
+        stream.close()
+    ttlt = time.monotonic() - started
+    METRICS.observe("llm", ttlt, engine=engine, model=model)
+    _record_usage(engine, model, *usage)
+    if stats is not None:
+        stats["ttlt"] = ttlt
+    return "".join(parts)
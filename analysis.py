@@ -0,0 +1,249 @@
+import json
+import re
+
+from ai_cache import ANALYSIS_CACHE, cache_key
+from ai_engine import StreamCancelled, generate, generate_stream, key_hash
+from metrics import METRICS
+from singleflight import ANALYSIS_FLIGHT
+
+# --- PROMPT & PARSING ANALISA PER ISU ---
+FIELDS = {
+    "sentiment": "Sentimen",
+    "risk": "Tahap Risiko",
+    "recommendation": "Cadangan",
+    "fact_status": "Fakta",
+}
+
+SENTIMENTS = ("Positif", "Negatif", "Neutral")
+FACT_STATUSES = ("Sahih", "Rumor", "Clickbait")
+
+_ISSUE_HEADER = re.compile(r"^[\s#>*_-]*ISU\s+(\d+)\b", re.IGNORECASE | re.MULTILINE)
+_FIELD_PATTERNS = {
+    key: re.compile(rf"\*{{0,2}}{re.escape(label)}\*{{0,2}}\s*:\s*\*{{0,2}}\s*(.+)", re.IGNORECASE)
+    for key, label in FIELDS.items()
+}
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+_ISSUES_ARRAY = re.compile(r'"issues"\s*:\s*\[')
+
+
+def entry_key(entry):
+    # GUID feed lebih stabil daripada pautan; pautan digunakan jika GUID tiada
+    return entry.get("id") or entry.get("link") or entry.get("title")
+
+
+def build_news_context(entries):
+    lines = []
+    for i, entry in enumerate(entries):
+        sources = entry.get("cluster_sources", [])
+        reach = f" (dilaporkan oleh {len(sources)} sumber)" if len(sources) > 1 else ""
+        lines.append(f"ISU {i+1}: {entry.title}{reach}\n")
+    return "".join(lines)
+
+
+def build_prompt(entries):
+    # Prompt yang ringkas dan direct untuk kurangkan ralat safety filter
+    return f"""
+    TUGAS: Analisis isu kesihatan awam dari berita berikut secara berasingan:
+    {build_news_context(entries)}
+    FORMAT (Markdown), ulang bagi SETIAP isu mengikut nombor asal:
+    ### ISU (nombor)
+    - **Sentimen**: (Positif/Negatif/Neutral)
+    - **Tahap Risiko**: (Skor 1-10)
+    - **Cadangan**: (Tindakan JKN Kedah)
+    - **Fakta**: (Sahih/Rumor/Clickbait)
+    """
+
+
+def build_json_prompt(entries):
+    # Mod berstruktur: satu rekod JSON bagi setiap isu supaya boleh disusun, di-cache dan diagregat
+    return f"""
+    TUGAS: Analisis isu kesihatan awam dari berita berikut secara berasingan:
+    {build_news_context(entries)}
+    Jawab dalam JSON SAHAJA, satu objek bagi SETIAP isu mengikut nombor asal:
+    {{"issues": [{{"isu": (nombor), "sentiment": "Positif|Negatif|Neutral", "risk": (integer 1-10), "recommendation": "(Tindakan JKN Kedah)", "fact_status": "Sahih|Rumor|Clickbait"}}]}}
+    """
+
+
+def _parse_risk(value):
+    match = re.search(r"\d+", value)
+    if not match:
+        return None
+    return max(1, min(10, int(match.group())))
+
+
+def parse_verdicts(text, count):
+    # Pecahkan respons kepada blok "ISU n" dan ambil medan berlabel dalam setiap blok
+    verdicts = [None] * count
+    headers = list(_ISSUE_HEADER.finditer(text or ""))
+    for pos, header in enumerate(headers):
+        index = int(header.group(1)) - 1
+        if not 0 <= index < count or verdicts[index] is not None:
+            continue
+        end = headers[pos + 1].start() if pos + 1 < len(headers) else len(text)
+        block = text[header.end():end]
+
+        verdict = {}
+        for key, pattern in _FIELD_PATTERNS.items():
+            match = pattern.search(block)
+            if match:
+                verdict[key] = match.group(1).strip().strip("*").strip()
+        if "risk" in verdict:
+            verdict["risk"] = _parse_risk(verdict["risk"])
+        if verdict.get("sentiment") and verdict.get("risk") is not None:
+            verdicts[index] = verdict
+    return verdicts
+
+
+def _choice(value, options):
+    text = str(value or "").strip().casefold()
+    for option in options:
+        if text.startswith(option.casefold()):
+            return option
+    return None
+
+
+def validate_verdict(item):
+    # Semakan murah bagi satu rekod JSON: medan wajib, pilihan yang dibenarkan dan julat risiko
+    if not isinstance(item, dict):
+        return None
+    sentiment = _choice(item.get("sentiment"), SENTIMENTS)
+    risk = _parse_risk(str(item.get("risk", "")))
+    if sentiment is None or risk is None:
+        return None
+    verdict = {"sentiment": sentiment, "risk": risk}
+    recommendation = item.get("recommendation")
+    if isinstance(recommendation, str) and recommendation.strip():
+        verdict["recommendation"] = recommendation.strip()
+    fact_status = _choice(item.get("fact_status"), FACT_STATUSES)
+    if fact_status is not None:
+        verdict["fact_status"] = fact_status
+    return verdict
+
+
+def parse_json_verdicts(text, count):
+    # Rekod yang tidak sah kekal None supaya hanya isu tersebut dihantar semula
+    verdicts = [None] * count
+    try:
+        data = json.loads(text or "")
+    except ValueError:
+        # Sesetengah model membungkus JSON dengan ```json ... ``` atau teks tambahan
+        match = _JSON_OBJECT.search(text or "")
+        try:
+            data = json.loads(match.group(0)) if match else None
+        except ValueError:
+            data = None
+    items = data.get("issues") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return verdicts
+    return _place_verdicts(items, count)
+
+
+def parse_partial_json_verdicts(text, count):
+    # Strim mod JSON: hanya rekod "issues" yang sudah lengkap diambil daripada respons separa
+    match = _ISSUES_ARRAY.search(text or "")
+    if match is None:
+        return [None] * count
+    decoder = json.JSONDecoder()
+    items = []
+    position = match.end()
+    while True:
+        while position < len(text) and text[position] in " \t\r\n,":
+            position += 1
+        try:
+            item, position = decoder.raw_decode(text, position)
+        except ValueError:
+            break
+        items.append(item)
+    return _place_verdicts(items, count)
+
+
+def _place_verdicts(items, count):
+    # Letak setiap rekod mengikut nombor "isu"; rekod pendua atau di luar julat diabaikan
+    verdicts = [None] * count
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("isu", position + 1)) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < count and verdicts[index] is None:
+            verdicts[index] = validate_verdict(item)
+    return verdicts
+
+
+def cached_verdicts(entries, engine, model, record_hits=True):
+    # Miss tidak direkod di sini: isu yang tiada dalam cache direkod sebagai miss oleh analyze_entries
+    verdicts = ANALYSIS_CACHE.get_verdicts([entry_key(entry) for entry in entries], engine, model, record=False)
+    if record_hits:
+        ANALYSIS_CACHE.record_hits(sum(verdict is not None for verdict in verdicts))
+    return verdicts
+
+
+def _generate_shared(engine, api_key, model, prompt, on_chunk, cancel_event, stats, structured):
+    # Prompt yang sama (selepas dinormalkan) dari sesi lain yang sedang berjalan dikongsi, bukan dihantar semula.
+    # Sesi yang menumpang tidak menerima strim; ia hanya menunggu respons penuh. Hanya sesi dengan kunci
+    # API yang sama digabungkan supaya ralat kunci lain (401, 429, kuota habis) tidak dikongsi.
+    def call():
+        if on_chunk is not None:
+            return generate_stream(engine, api_key, model, prompt, on_chunk=on_chunk, cancel_event=cancel_event,
+                                   stats=stats, json_mode=structured)
+        return generate(engine, api_key, model, prompt, json_mode=structured)
+
+    key = (cache_key(prompt, engine, model), key_hash(api_key))
+    try:
+        return ANALYSIS_FLIGHT.do(key, call)
+    except StreamCancelled:
+        # Sesi yang memulakan panggilan membatalkannya; teruskan sendiri jika sesi ini belum dibatalkan
+        if cancel_event is not None and cancel_event.is_set():
+            raise
+        return ANALYSIS_FLIGHT.do(key, call)
+
+
+def analyze_entries(entries, engine, api_key, model, on_prompt=None, on_chunk=None, cancel_event=None, stats=None,
+                    structured=False):
+    # Hanya entri yang belum pernah dianalisa dihantar ke LLM (satu permintaan berkelompok);
+    # keputusan lama diambil dari cache dan digabungkan mengikut susunan asal.
+    keys = [entry_key(entry) for entry in entries]
+    verdicts = ANALYSIS_CACHE.get_verdicts(keys, engine, model)
+    pending = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    if not pending:
+        return verdicts, 0, None
+
+    pending_entries = [entries[i] for i in pending]
+    with METRICS.timer("prompt"):
+        prompt = build_json_prompt(pending_entries) if structured else build_prompt(pending_entries)
+    if on_prompt is not None:
+        on_prompt(prompt)
+    # Tidak direkod: hit/miss dikira sekali bagi setiap isu (get_verdicts di atas), bukan setiap kumpulan
+    text = ANALYSIS_CACHE.get(prompt, engine, model, record=False)
+    if text is None:
+        text = _generate_shared(engine, api_key, model, prompt, on_chunk, cancel_event, stats, structured)
+
+    with METRICS.timer("parse", structured=structured):
+        parsed = (parse_json_verdicts if structured else parse_verdicts)(text, len(pending))
+    METRICS.incr("parse_failures", parsed.count(None), structured=structured)
+    for i, verdict in zip(pending, parsed):
+        if verdict is not None:
+            verdicts[i] = verdict
+            ANALYSIS_CACHE.put_verdict(keys[i], engine, model, verdict)
+    if all(verdict is not None for verdict in parsed):
+        ANALYSIS_CACHE.put(prompt, engine, model, text)
+    return verdicts, len(pending), text
+
+
+def render_verdicts(entries, verdicts):
+    cards = []
+    for entry, verdict in zip(entries, verdicts):
+        if verdict is None:
+            cards.append(f"#### 📌 {entry.title}\n\n_Analisa tidak tersedia untuk isu ini._\n")
+            continue
+        risk = verdict.get("risk")
+        cards.append(
+            f"#### 📌 {entry.title}\n"
+            f"- **Sentimen**: {verdict.get('sentiment', '-')}\n"
+            f"- **Tahap Risiko**: {f'{risk}/10' if risk is not None else '-'}\n"
+            f"- **Cadangan**: {verdict.get('recommendation', '-')}\n"
+            f"- **Fakta**: {verdict.get('fact_status', '-')}\n"
+        )
+    return "\n---\n".join(cards)
@@ -1,9 +1,14 @@
 import streamlit as st
 import feedparser
 import urllib.parse
-from google import genai
+import threading
 import time
 
+from ai_engine import DEFAULT_MODELS, GEMINI
+from analysis import parse_partial_json_verdicts, render_verdicts
+from batching import MAX_ENTRIES, analyze_batches, rank_by_risk
+from rate_limit import MAX_RETRIES, SCHEDULER, is_rate_limited
+
 # --- PAGE CONFIG ---
 st.set_page_config(
     page_title="Kedah Infodemic Firewatch",
@@ -12,9 +17,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_data
+def load_css(path):
+    with open(path) as f:
+        return f.read()
+
 # --- LOAD CSS ---
-with open("style.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+st.markdown(f"<style>{load_css('style.css')}</style>", unsafe_allow_html=True)
 
 # --- SESSION STATE ---
 if 'api_key' not in st.session_state:
@@ -62,42 +71,55 @@ if run_btn:
             feed = feedparser.parse(encoded_url)
             
             if feed.entries:
-                st.session_state.last_results = feed.entries[:5]  # Ambil 5 berita teratas
-                
-                # Sediakan input untuk AI (Batching)
-                news_context = ""
-                for i, entry in enumerate(st.session_state.last_results):
-                    news_context += f"ISU {i+1}: {entry.title}\n"
+                # Semua berita dianalisa dalam kumpulan selari (had keselamatan MAX_ENTRIES)
+                st.session_state.last_results = feed.entries[:MAX_ENTRIES]
 
                 # Tunjukkan header pengesanan
                 st.subheader(f"🔍 {len(st.session_state.last_results)} ISU DIKESAN")
                 
                 try:
-                    client = genai.Client(api_key=st.session_state.api_key)
-                    
+                    output = st.empty()
                     with st.spinner("🧠 Pakar AI sedang menganalisa keseluruhan senarai isu..."):
-                        response = client.models.generate_content(
-                            model="gemini-2.0-flash", 
-                            contents=f"""
-                            Berlakon sebagai Pakar Kesihatan Awam dan Komunikasi Risiko di JKN Kedah.
-                            Analisis senarai berita berikut secara berasingan:
-                            
-                            {news_context}
-                            
-                            Sila berikan output dalam format Markdown yang kemas. 
-                            Bagi SETIAP isu, berikan:
-                            1. **Isu**: (Tajuk Isu)
-                            2. **Sentiment**: (Positif/Negatif/Neutral)
-                            3. **Tahap Risiko**: (Skor 1-10 &sebab)
-                            4. **Cadangan**: (Tindakan JKN Kedah)
-                            5. **Status Fakta**: (Sahih/Rumor/Clickbait)
-                            
-                            Gunakan format 'card' atau pembahagi yang jelas antara isu.
-                            """
+                        # Penjadual mengendalikan had kadar dan cubaan semula (Retry-After + backoff);
+                        # perancang kumpulan memecahkan senarai ikut bajet token model
+                        model = DEFAULT_MODELS[GEMINI]
+                        # Strim: paparkan kad bagi rekod JSON yang sudah lengkap (kumpulan pertama) sebaik sahaja tiba
+                        chunks = []
+                        stream_entries = []
+                        stats = {}
+                        cancel_event = threading.Event()
+                        job = SCHEDULER.submit(
+                            GEMINI, st.session_state.api_key, model,
+                            analyze_batches, st.session_state.last_results, GEMINI, st.session_state.api_key, model,
+                            on_chunk=chunks.append, cancel_event=cancel_event, stats=stats, structured=True,
+                            on_stream_entries=stream_entries.extend
                         )
+                        try:
+                            while not job.done():
+                                if chunks:
+                                    partial = "".join(chunks)
+                                    parsed = [
+                                        (entry, verdict) for entry, verdict
+                                        in zip(stream_entries, parse_partial_json_verdicts(partial, len(stream_entries))) if verdict
+                                    ]
+                                    if parsed:
+                                        output.markdown(render_verdicts(*zip(*parsed)) + " ▌")
+                                    else:
+                                        output.code(partial, language="json")
+                                time.sleep(0.2)
+                        finally:
+                            # Skrip dihentikan (cth. pengguna tekan butang lain): hentikan penjanaan
+                            if not job.done():
+                                cancel_event.set()
+                        verdicts, _, response_text = job.future.result()
                     
                     st.success("✅ ANALISIS BERKELOMPOK SIAP")
-                    st.markdown(response.text)
+                    if any(verdict is not None for verdict in verdicts):
+                        # Gabungan semua kumpulan, disusun mengikut risiko tertinggi
+                        output.markdown(render_verdicts(*rank_by_risk(st.session_state.last_results, verdicts)))
+                    else:
+                        output.markdown(response_text or "")
+                    st.caption(f"⏱️ Token pertama: {stats.get('ttft', 0):.2f} s | Siap: {stats.get('ttlt', 0):.2f} s")
                     
                     # Tambah pautan berita di bawah
                     with st.expander("🔗 Pautan Berita Asal"):
@@ -105,10 +127,10 @@ if run_btn:
                             st.markdown(f"- [{entry.title}]({entry.link})")
                             
                 except Exception as e:
-                    if "429" in str(e):
+                    if is_rate_limited(e):
                         st.error("🚨 KUOTA AI TAMAT (RESOURCE EXHAUSTED)")
-                        st.warning("""
-                        Punca: Anda menggunakan pelan percuma Gemini. 
+                        st.warning(f"""
+                        Punca: Anda menggunakan pelan percuma Gemini ({MAX_RETRIES} cubaan semula automatik telah dibuat). 
                         Tindakan: Sila tunggu 1 minit sebelum mencuba lagi.
                         Tips: Batching telah diaktifkan untuk mengurangkan penggunaan kuota.
                         """)
@@ -0,0 +1,150 @@
+import math
+import os
+import time
+from concurrent.futures import wait
+
+from ai_engine import CHATGPT, DEEPSEEK, GEMINI
+from analysis import analyze_entries, build_news_context, build_prompt, cached_verdicts
+from rate_limit import SCHEDULER
+
+# --- PERANCANG KUMPULAN (BATCH) BERASASKAN BAJET TOKEN ---
+CHARS_PER_TOKEN = 4  # anggaran kasar bagi teks Melayu/Inggeris
+OUTPUT_TOKENS_PER_ENTRY = 90  # satu kad "### ISU n" dengan empat medan
+OUTPUT_HEADROOM = 0.8  # guna hanya 80% had output supaya respons tidak terpotong
+MAX_BATCH_ENTRIES = int(os.environ.get("KIF_MAX_BATCH_ENTRIES", "15"))  # had kependaman satu panggilan
+MAX_ENTRIES = int(os.environ.get("KIF_MAX_ENTRIES", "100"))  # had keselamatan bilangan isu dianalisa
+
+# (tetingkap konteks, had token output) bagi setiap model
+MODEL_LIMITS = {
+    "gemini-2.0-flash": (1048576, 8192),
+    "gemini-1.5-flash": (1048576, 8192),
+    "gemini-1.5-flash-8b": (1048576, 8192),
+    "gemini-1.5-pro": (2097152, 8192),
+    "gpt-4o-mini": (128000, 16384),
+    "gpt-4o": (128000, 16384),
+    "deepseek-chat": (64000, 8192),
+}
+ENGINE_LIMITS = {
+    GEMINI: (1048576, 8192),
+    CHATGPT: (128000, 4096),
+    DEEPSEEK: (64000, 4096),
+}
+DEFAULT_LIMITS = (32000, 4096)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def model_limits(engine, model):
+    return MODEL_LIMITS.get(model) or ENGINE_LIMITS.get(engine, DEFAULT_LIMITS)
+
+
+def plan_batches(entries, engine, model, max_entries=MAX_BATCH_ENTRIES):
+    # Bahagikan entri kepada kumpulan yang muat dalam bajet input (konteks - output) dan output
+    # model. Saiz kumpulan diseimbangkan supaya semua panggilan selari siap pada masa yang hampir sama.
+    if not entries:
+        return []
+    context, max_output = model_limits(engine, model)
+    output_budget = int(max_output * OUTPUT_HEADROOM)
+    input_budget = context - max_output - estimate_tokens(build_prompt([]))
+    per_batch = max(1, min(max_entries, output_budget // OUTPUT_TOKENS_PER_ENTRY))
+    target = math.ceil(len(entries) / math.ceil(len(entries) / per_batch))
+
+    batches = []
+    batch = []
+    input_tokens = 0
+    for entry in entries:
+        tokens = estimate_tokens(build_news_context([entry]))
+        if batch and (len(batch) >= target or input_tokens + tokens > input_budget):
+            batches.append(batch)
+            batch = []
+            input_tokens = 0
+        batch.append(entry)
+        input_tokens += tokens
+    batches.append(batch)
+    return batches
+
+
+def analyze_batches(entries, engine, api_key, model, on_prompt=None, on_chunk=None, cancel_event=None, stats=None,
+                    structured=False, on_stream_entries=None):
+    # Sama seperti analyze_entries tetapi isu yang belum ada dalam cache dipecah kepada beberapa
+    # kumpulan yang dihantar serentak. Kumpulan pertama dijalankan dalam thread semasa (menggunakan
+    # token kadar pemanggil); kumpulan lain dijadualkan melalui SCHEDULER.submit_batch (pool berasingan,
+    # token bucket yang sama) dengan cubaan semula masing-masing. Hanya kumpulan pertama distrim ke on_chunk.
+    started = time.monotonic()
+    verdicts = cached_verdicts(entries, engine, model)
+    pending = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    if not pending:
+        return verdicts, 0, None
+    batches = plan_batches([entries[i] for i in pending], engine, model)
+    kwargs = {"on_prompt": on_prompt, "cancel_event": cancel_event, "structured": structured}
+    if on_stream_entries is not None:
+        # Entri kumpulan pertama (yang distrim) supaya UI boleh memaparkan kad separa mengikut tajuk
+        on_stream_entries(batches[0])
+
+    jobs = [
+        SCHEDULER.submit_batch(engine, api_key, model, analyze_entries, batch, engine, api_key, model, **kwargs)
+        for batch in batches[1:]
+    ]
+    try:
+        first = analyze_entries(batches[0], engine, api_key, model, on_chunk=on_chunk, stats=stats, **kwargs)
+    except Exception:
+        # Kumpulan lain tetap disimpan ke cache; penjadual pemanggil akan cuba semula yang gagal sahaja
+        wait([job.future for job in jobs])
+        raise
+    wait([job.future for job in jobs])
+
+    results = [first]
+    errors = []
+    for job in jobs:
+        if job.future.cancelled():
+            errors.append(RuntimeError("Analisa dibatalkan"))
+            results.append(None)
+        elif job.future.exception() is not None:
+            errors.append(job.future.exception())
+            results.append(None)
+        else:
+            results.append(job.future.result())
+
+    # Gabungkan mengikut susunan asal; kumpulan yang gagal kekal None (boleh dicuba semula)
+    offset = 0
+    texts = []
+    unparsed = []
+    for batch, result in zip(batches, results):
+        if result is not None:
+            batch_verdicts, _, text = result
+            for position, verdict in enumerate(batch_verdicts):
+                verdicts[pending[offset + position]] = verdict
+                if verdict is None:
+                    unparsed.append(pending[offset + position])
+            if text:
+                texts.append(text)
+        offset += len(batch)
+
+    if structured and unparsed and not (cancel_event is not None and cancel_event.is_set()):
+        # Mod JSON: hanya rekod yang gagal disahkan diminta semula (sekali), bukan keseluruhan kumpulan
+        job = SCHEDULER.submit_batch(engine, api_key, model, analyze_entries, [entries[i] for i in unparsed],
+                               engine, api_key, model, **kwargs)
+        wait([job.future])
+        if not job.future.cancelled() and job.future.exception() is None:
+            repaired, _, text = job.future.result()
+            for i, verdict in zip(unparsed, repaired):
+                verdicts[i] = verdict
+            if text:
+                texts.append(text)
+
+    if errors and not any(verdict is not None for verdict in verdicts):
+        raise errors[0]
+    if stats is not None:
+        stats["ttlt"] = time.monotonic() - started
+    return verdicts, len(pending), "\n\n".join(texts)
+
+
+def rank_by_risk(entries, verdicts):
+    # Susun isu mengikut risiko tertinggi; isu tanpa keputusan diletakkan di bawah
+    order = sorted(
+        range(len(entries)),
+        key=lambda i: (verdicts[i] is None or verdicts[i].get("risk") is None, -((verdicts[i] or {}).get("risk") or 0), i)
+    )
+    return [entries[i] for i in order], [verdicts[i] for i in order]
@@ -0,0 +1,141 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- PELAYAN LLM PALSU SERASI OPENAI (PENANDA ARAS) ---
+# /v1/chat/completions (biasa + strim SSE) dan /v1/models. Kependaman = latency + token output x
+# token_latency. Ralat 429 (dengan Retry-After) disuntik mengikut error_rate.
+_ISSUE_LINE = re.compile(r"^\s*ISU (\d+):", re.MULTILINE)
+SENTIMENTS = ["Negatif", "Neutral", "Positif"]
+FACTS = ["Sahih", "Rumor", "Clickbait"]
+
+
+def fake_verdicts(prompt):
+    count = len(_ISSUE_LINE.findall(prompt))
+    rng = random.Random(prompt)
+    return [
+        {
+            "isu": i + 1,
+            "sentiment": rng.choice(SENTIMENTS),
+            "risk": rng.randint(1, 10),
+            "recommendation": "Pantau media sosial dan keluarkan kenyataan media jika perlu.",
+            "fact_status": rng.choice(FACTS),
+        }
+        for i in range(count)
+    ]
+
+
+def fake_reply(prompt, json_mode):
+    verdicts = fake_verdicts(prompt)
+    if json_mode:
+        return json.dumps({"issues": verdicts}, ensure_ascii=False)
+    return "\n".join(
+        f"### ISU {v['isu']}\n- **Sentimen**: {v['sentiment']}\n- **Tahap Risiko**: {v['risk']}/10\n"
+        f"- **Cadangan**: {v['recommendation']}\n- **Fakta**: {v['fact_status']}\n"
+        for v in verdicts
+    )
+
+
+class FakeLLMServer:
+    def __init__(self, latency=0.3, token_latency=0.001, error_rate=0.0, retry_after=0.5, port=0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self._rng = random.Random(0)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._json(200, {"object": "list", "data": [{"id": "deepseek-chat", "object": "model", "owned_by": "bench"}]})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with fake._lock:
+                    fake.requests += 1
+                    limited = fake._rng.random() < fake.error_rate
+                    if limited:
+                        fake.rate_limited += 1
+                if limited:
+                    self._json(429, {"error": {"message": "Rate limit reached (429)", "type": "rate_limit_exceeded"}},
+                               {"Retry-After": str(fake.retry_after)})
+                    return
+
+                prompt = body["messages"][-1]["content"]
+                json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+                reply = fake_reply(prompt, json_mode)
+                usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(reply) // 4}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                time.sleep(fake.latency)
+                if body.get("stream"):
+                    self._stream(body, reply, usage)
+                    return
+                time.sleep(usage["completion_tokens"] * fake.token_latency)
+                self._json(200, {
+                    "id": "bench", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+
+            def _stream(self, body, reply, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                step = 16  # ~4 token bagi setiap bahagian
+                for start in range(0, len(reply), step):
+                    chunk = {
+                        "id": "bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": reply[start:start + step]}, "finish_reason": None}],
+                    }
+                    try:
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    except (BrokenPipeError, ConnectionResetError):
+                        return  # klien membatalkan strim
+                    time.sleep(step / 4 * fake.token_latency)
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    final = {"id": "bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": body.get("model"), "choices": [], "usage": usage}
+                    self.wfile.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="fake-llm").start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
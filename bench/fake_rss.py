@@ -0,0 +1,126 @@
+import hashlib
+import random
+import re
+import threading
+import time
+import urllib.parse
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+# --- PELAYAN RSS PALSU (PENANDA ARAS) ---
+# Menjana feed gaya Google News bagi sebarang carian: saiz dan kependaman boleh ditetapkan.
+PORTALS = ["Berita Harian", "Harian Metro", "Sinar Harian", "Kosmo", "Utusan Malaysia", "Astro Awani", "Buletin TV3"]
+TEMPLATES = [
+    "JKN {place}: kes {keyword} melibatkan {topic} meningkat minggu ini",
+    "Orang ramai diminta berwaspada isu {keyword} dan {topic} di {place}",
+    "Tular di media sosial: dakwaan {keyword} berkaitan {topic} di {place} tidak benar",
+    "Pegawai kesihatan {place} pantau {keyword} dalam {topic}",
+    "{keyword}: {number} individu dirawat di hospital {place} selepas {topic}",
+    "KKM sahkan laporan {keyword} membabitkan {topic} di {place}",
+]
+PLACES = ["Alor Setar", "Sungai Petani", "Kulim", "Langkawi", "Jitra", "Baling", "Pendang", "Yan"]
+# Setiap berita mendapat topik unik supaya berita berbeza tidak dikelompokkan oleh dedup
+# (hanya salinan sindiket yang berkongsi tajuk yang sama)
+TOPIC_SUBJECTS = [
+    "kantin sekolah", "asrama pelajar", "pasar malam", "kilang papan", "taska swasta", "warga emas",
+    "pekerja asing", "kolam renang", "bekalan air", "gerai makanan", "pusat tahfiz", "klinik desa",
+    "kem latihan", "majlis kenduri",
+]
+TOPIC_ACTIONS = [
+    "saringan", "aduan", "serbuan", "amaran", "kajian", "notis", "kempen", "larangan", "pemeriksaan", "penutupan",
+]
+TOPICS = [f"{action} {subject}" for subject in TOPIC_SUBJECTS for action in TOPIC_ACTIONS]
+_QUERY_NOISE = re.compile(r'"|\(?site:\S+(?: OR site:\S+\)?)?|when:\S+')
+
+
+def query_keyword(query):
+    # Buang quotes, penapis site: dan when: supaya exact/relaxed bagi kata kunci sama menjana feed sama
+    return " ".join(_QUERY_NOISE.sub(" ", query).split())
+
+
+def build_feed(keyword, items, duplicate_ratio=0.3):
+    # Deterministik bagi setiap kata kunci; sebahagian berita "disindiket" ke beberapa portal
+    rng = random.Random(hashlib.sha256(keyword.encode("utf-8")).hexdigest())
+    now = time.time() // 3600 * 3600  # stabil sejam supaya ETag/304 boleh diuji
+    topics = rng.sample(TOPICS, len(TOPICS))
+    rows = []
+    story = None
+    stories = 0
+    for i in range(items):
+        if story is None or rng.random() >= duplicate_ratio:
+            # Melebihi bilangan topik: tambah nombor siri supaya tajuk kekal unik
+            topic = topics[stories % len(topics)] + (f" {stories // len(topics) + 1}" if stories >= len(topics) else "")
+            story = rng.choice(TEMPLATES).format(
+                keyword=keyword, place=rng.choice(PLACES), number=rng.randint(2, 90), topic=topic
+            )
+            stories += 1
+        portal = rng.choice(PORTALS)
+        guid = hashlib.sha1(f"{keyword}|{i}".encode("utf-8")).hexdigest()
+        rows.append(
+            "<item>"
+            f"<title>{escape(story)} - {escape(portal)}</title>"
+            f"<link>https://berita.example/{guid}</link>"
+            f'<guid isPermaLink="false">{guid}</guid>'
+            f"<pubDate>{formatdate(now - i * 600)}</pubDate>"
+            f"<description>{escape(story)}</description>"
+            f'<source url="https://berita.example">{escape(portal)}</source>'
+            "</item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>{escape(keyword)}</title>{''.join(rows)}</channel></rss>"
+    ).encode("utf-8")
+
+
+class FakeRSSServer:
+    def __init__(self, items=20, latency=0.05, port=0):
+        self.items = items
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/rss/search"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query).get("q", [""])[0]
+                body = build_feed(query_keyword(query), fake.items)
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    with fake._lock:
+                        fake.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="fake-rss").start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
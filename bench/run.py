@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.fake_llm import FakeLLMServer
+from bench.fake_rss import FakeRSSServer
+
+# --- PENANDA ARAS HUJUNG-KE-HUJUNG (LUAR TALIAN) ---
+# Contoh: python -m bench.run --keywords 1,5 --feed-sizes 20,100 --concurrency 1,4,16 --error-rate 0.1
+# Saluran fetch -> tapis -> kelompok -> analisa dijalankan tanpa UI terhadap pelayan RSS dan LLM palsu.
+
+
+def parse_ints(text):
+    return [int(value) for value in text.split(",") if value.strip()]
+
+
+def percentile_ms(values, q):
+    from metrics import percentile
+    value = percentile(sorted(values), q)
+    return round(value * 1000, 1) if value is not None else None
+
+
+def run_keyword(keyword, options):
+    from ai_engine import DEEPSEEK
+    from batching import MAX_ENTRIES, analyze_batches
+    from dedup import cluster_entries
+    from rate_limit import SCHEDULER
+    from rss_fetch import fetch_entries
+    from watchlist import get_matcher
+
+    # Sama seperti butang "LANCARKAN FIREWATCH" di dashboard
+    started = time.perf_counter()
+    entries = fetch_entries(keyword, "3d", ["Semua Platform"])
+    relevant = get_matcher(((keyword,),)).filter_entries(entries) or entries
+    issues = cluster_entries(relevant)[:MAX_ENTRIES]
+    kwargs = {"structured": options.structured}
+    if options.stream:
+        kwargs.update(on_chunk=lambda text: None, stats={})
+    job = SCHEDULER.submit(DEEPSEEK, "bench", "deepseek-chat", analyze_batches, issues, DEEPSEEK, "bench", "deepseek-chat", **kwargs)
+    verdicts, _, _ = job.future.result()
+    return time.perf_counter() - started, len(issues), sum(verdict is not None for verdict in verdicts)
+
+
+def run_scenario(keyword_count, feed_size, concurrency, options, rss, llm):
+    from ai_cache import ANALYSIS_CACHE
+    from metrics import METRICS, format_labels
+    from rss_fetch import FEED_CACHE
+
+    rss.items = feed_size
+    FEED_CACHE.clear()
+    ANALYSIS_CACHE.clear()
+    METRICS.reset()
+    requests_before = (rss.requests, llm.requests, llm.rate_limited)
+    flights_before = {name: stats.get("coalesced", 0) for name, stats in METRICS.sources().items() if name.endswith("_flight")}
+
+    # Setiap "sesi" (penganalisa) menjalankan semua kata kunci mengikut turutan, semua sesi serentak
+    keywords = [f"isu {i + 1} kedah" for i in range(keyword_count)]
+    tasks = [keyword for _ in range(options.rounds) for keyword in keywords]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        sessions = [pool.submit(lambda: [run_keyword(keyword, options) for keyword in tasks]) for _ in range(concurrency)]
+        results = [result for session in sessions for result in session.result()]
+    wall = time.perf_counter() - started
+
+    latencies = [latency for latency, _, _ in results]
+    issues = sum(count for _, count, _ in results)
+    analysed = sum(count for _, _, count in results)
+    coalesced = sum(
+        stats.get("coalesced", 0) - flights_before.get(name, 0)
+        for name, stats in METRICS.sources().items() if name.endswith("_flight")
+    )
+    stages = METRICS.summary()
+    return {
+        "keywords": keyword_count,
+        "feed_size": feed_size,
+        "concurrency": concurrency,
+        "runs": len(results),
+        "wall_s": round(wall, 3),
+        "runs_per_s": round(len(results) / wall, 2),
+        "issues_per_s": round(issues / wall, 1),
+        "p50_ms": percentile_ms(latencies, 0.5),
+        "p95_ms": percentile_ms(latencies, 0.95),
+        "analysed": f"{analysed}/{issues}",
+        "rss_requests": rss.requests - requests_before[0],
+        "llm_requests": llm.requests - requests_before[1],
+        "llm_429": llm.rate_limited - requests_before[2],
+        "coalesced": coalesced,
+        "stages": {f"{stage} [{format_labels(labels)}]" if labels else stage:
+                   {"p50_ms": round(s["p50"] * 1000, 1), "p95_ms": round(s["p95"] * 1000, 1), "count": s["count"]}
+                   for (stage, labels), s in stages.items()},
+    }
+
+
+def print_table(rows):
+    columns = ["keywords", "feed_size", "concurrency", "runs", "wall_s", "runs_per_s", "issues_per_s",
+               "p50_ms", "p95_ms", "analysed", "rss_requests", "llm_requests", "llm_429", "coalesced"]
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    print("  ".join(column.rjust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(str(row[column]).rjust(widths[column]) for column in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Penanda aras luar talian saluran Kedah Infodemic Firewatch.")
+    parser.add_argument("--keywords", default="1,5", help="Bilangan kata kunci bagi setiap sesi (senarai dipisah koma).")
+    parser.add_argument("--feed-sizes", default="20,100", help="Bilangan item setiap feed RSS palsu.")
+    # 16 sesi = saiz pool SCHEDULER: feed 100 item (> MAX_BATCH_ENTRIES isu) menguji laluan berbilang kumpulan
+    parser.add_argument("--concurrency", default="1,4,16", help="Bilangan sesi serentak.")
+    parser.add_argument("--rounds", type=int, default=1, help="Ulangan setiap kata kunci dalam sesi (cache panas selepas pusingan pertama).")
+    parser.add_argument("--rss-latency", type=float, default=0.05, help="Kependaman pelayan RSS (saat).")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Kependaman asas LLM (saat).")
+    parser.add_argument("--token-latency", type=float, default=0.001, help="Kependaman setiap token output (saat).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Kebarangkalian respons 429 daripada LLM.")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Nilai header Retry-After bagi 429 (saat).")
+    parser.add_argument("--rpm", type=int, default=6000, help="Had RPM penjadual bagi enjin penanda aras.")
+    parser.add_argument("--stream", action="store_true", help="Guna strim (SSE) untuk panggilan LLM.")
+    parser.add_argument("--markdown", dest="structured", action="store_false", help="Guna prompt Markdown dan bukan JSON.")
+    parser.add_argument("--json", help="Simpan keputusan (termasuk masa setiap peringkat) ke fail JSON.")
+    options = parser.parse_args(argv)
+
+    rss = FakeRSSServer(latency=options.rss_latency).start()
+    llm = FakeLLMServer(latency=options.llm_latency, token_latency=options.token_latency,
+                        error_rate=options.error_rate, retry_after=options.retry_after).start()
+
+    # Konfigurasi dibaca semasa modul diimport: tetapkan sebelum mengimport saluran
+    os.environ["KIF_RSS_URL"] = rss.url
+    os.environ["KIF_DEEPSEEK_BASE_URL"] = llm.base_url
+    os.environ["KIF_RPM_DEEPSEEK"] = str(options.rpm)
+    os.environ["KIF_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="kif-bench-"), "cache.sqlite3")
+
+    # Import awal supaya masa import tidak dikira dalam senario pertama
+    import batching, rss_fetch  # noqa: F401
+
+    rows = []
+    try:
+        for keyword_count in parse_ints(options.keywords):
+            for feed_size in parse_ints(options.feed_sizes):
+                for concurrency in parse_ints(options.concurrency):
+                    rows.append(run_scenario(keyword_count, feed_size, concurrency, options, rss, llm))
+    finally:
+        rss.stop()
+        llm.stop()
+
+    print_table(rows)
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# --- PENANDA ARAS PERMULAAN & RERUN STREAMLIT ---
+# Contoh: python -m bench.startup --imports 5 --reruns 20
+# 1) Masa import modul (proses baharu setiap kali) dan SDK yang dimuatkan.
+# 2) Masa larian pertama dan rerun penuh streamlit_app.py melalui AppTest (tanpa pelayar).
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_PROBE = (
+    "import sys, time\n"
+    "started = time.perf_counter()\n"
+    "import {module}\n"
+    "print(time.perf_counter() - started, 'openai' in sys.modules, 'google.genai' in sys.modules)\n"
+)
+
+
+def measure_import(module, repeat):
+    timings = []
+    loaded = None
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(output[0]))
+        loaded = [name for name, flag in zip(("openai", "google.genai"), output[1:]) if flag == "True"]
+    return timings, loaded
+
+
+def measure_reruns(reruns):
+    from streamlit.testing.v1 import AppTest
+
+    started = time.perf_counter()
+    app = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=60).run()
+    first = time.perf_counter() - started
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - started)
+    return first, timings
+
+
+def ms(value):
+    return f"{value * 1000:.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Penanda aras masa permulaan dan rerun Streamlit.")
+    parser.add_argument("--imports", type=int, default=5, help="Bilangan proses baharu bagi setiap ujian import.")
+    parser.add_argument("--reruns", type=int, default=20, help="Bilangan rerun penuh selepas larian pertama.")
+    parser.add_argument("--modules", default="ai_engine,analysis,rate_limit", help="Modul yang diukur masa importnya.")
+    options = parser.parse_args(argv)
+
+    # Cache dan stor sementara supaya fail projek tidak disentuh
+    workdir = tempfile.mkdtemp(prefix="kif-startup-")
+    os.environ.setdefault("KIF_CACHE_PATH", os.path.join(workdir, "cache.sqlite3"))
+    os.environ.setdefault("KIF_STORE_PATH", os.path.join(workdir, "store.sqlite3"))
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    print(f"{'modul':<14}{'p50 (ms)':>10}{'maks (ms)':>11}  SDK dimuatkan")
+    for module in options.modules.split(","):
+        timings, loaded = measure_import(module.strip(), options.imports)
+        print(f"{module:<14}{ms(statistics.median(timings)):>10}{ms(max(timings)):>11}  {', '.join(loaded) or '-'}")
+
+    from metrics import percentile
+
+    first, timings = measure_reruns(options.reruns)
+    timings.sort()
+    print()
+    print(f"Larian pertama streamlit_app.py: {ms(first)} ms")
+    print(f"Rerun penuh (n={len(timings)}): p50 {ms(statistics.median(timings))} ms | "
+          f"p95 {ms(percentile(timings, 0.95))} ms | maks {ms(timings[-1])} ms")
+
+
+if __name__ == "__main__":
+    main()
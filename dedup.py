@@ -0,0 +1,128 @@
+import hashlib
+import re
+import unicodedata
+from functools import lru_cache
+
+import feedparser
+
+# --- PENGELOMPOKAN BERITA HAMPIR SAMA (MINHASH + LSH) ---
+NUM_PERM = 32
+BANDS = 16  # 16 jalur x 2 baris: pasangan dengan Jaccard ~0.3 ke atas hampir pasti menjadi calon
+SIMILARITY = 0.8  # ambang Jaccard sebenar (bigram perkataan) untuk dianggap berita yang sama
+
+# Tajuk yang berbeza tempat atau angka ialah kejadian berasingan walaupun ayatnya hampir sama
+# ("Kes denggi meningkat di Kulim" lwn "... di Jitra"); kelompok tidak boleh menyembunyikannya.
+PLACE_NAMES = [
+    "alor setar", "alor star", "kota setar", "kubang pasu", "jitra", "changlun", "bukit kayu hitam",
+    "padang terap", "kuala nerang", "langkawi", "kuah", "kuala muda", "sungai petani", "bedong", "merbok",
+    "gurun", "yan", "guar chempedak", "sik", "baling", "kupang", "kulim", "lunas", "bandar baharu", "serdang",
+    "pendang", "pokok sena", "kuala kedah", "pulau pinang", "penang", "perlis", "kangar", "perak",
+    "kelantan", "terengganu", "pahang", "selangor", "kuala lumpur", "putrajaya", "negeri sembilan",
+    "melaka", "johor", "sabah", "sarawak", "labuan", "thailand", "singapura",
+]
+NUMBER_WORDS = {
+    "satu", "dua", "tiga", "empat", "lima", "enam", "tujuh", "lapan", "sembilan", "sepuluh",
+    "sebelas", "belas", "puluh", "ratus", "ribu", "juta", "seratus", "seribu", "sejuta",
+}
+
+_ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_PERMS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _PRIME | 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _PRIME)
+    for i in range(NUM_PERM)
+]
+_NON_WORD = re.compile(r"[^\w\s]+")
+_PLACE_PATTERN = re.compile(r"\b(?:" + "|".join(re.escape(place) for place in PLACE_NAMES) + r")\b")
+
+
+def strip_source_suffix(title):
+    # Tajuk Google News berakhir dengan " - Nama Portal"
+    head, sep, _ = title.rpartition(" - ")
+    return head if sep and head else title
+
+
+def title_words(title):
+    text = unicodedata.normalize("NFKD", strip_source_suffix(title))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text.casefold()).split()
+
+
+def title_shingles(title):
+    # Bigram perkataan: susunan perkataan dikira, jadi tajuk pendek yang berkongsi kebanyakan
+    # perkataan tunggal tidak semestinya serupa
+    words = title_words(title)
+    if len(words) < 2:
+        return frozenset(words)
+    return frozenset(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+
+def title_anchors(title):
+    # Nama tempat dan angka (digit atau perkataan) dalam tajuk
+    words = title_words(title)
+    places = set(_PLACE_PATTERN.findall(" ".join(words)))
+    numbers = {word for word in words if any(ch.isdigit() for ch in word) or word in NUMBER_WORDS}
+    return frozenset(places | numbers)
+
+
+@lru_cache(maxsize=8192)
+def _shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(shingles):
+    hashes = [_shingle_hash(shingle) for shingle in shingles] or [0]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS]
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def source_name(entry):
+    source = entry.get("source", {}).get("title")
+    if source:
+        return source
+    _, sep, tail = entry.get("title", "").rpartition(" - ")
+    return tail if sep else "Berita Tempatan"
+
+
+def cluster_entries(entries, threshold=SIMILARITY):
+    # Kumpulkan salinan berita yang disindiket merentasi portal. Setiap kelompok diwakili oleh
+    # entri pertama (salinan baharu, entri asal dalam cache feed tidak diubah) dengan senarai
+    # semua sumber dalam kunci "cluster_sources".
+    shingles = [title_shingles(entry.get("title", "")) for entry in entries]
+    anchors = [title_anchors(entry.get("title", "")) for entry in entries]
+    parent = list(range(len(entries)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # LSH: hanya pasangan yang berkongsi satu jalur MinHash dibandingkan (bukan semua pasangan)
+    buckets = {}
+    for i, shingle_set in enumerate(shingles):
+        signature = minhash(shingle_set)
+        for band in range(BANDS):
+            key = (band, tuple(signature[band * _ROWS:(band + 1) * _ROWS]))
+            for j in buckets.get(key, ()):
+                a, b = find(i), find(j)
+                if a != b and anchors[i] == anchors[j] and jaccard(shingle_set, shingles[j]) >= threshold:
+                    parent[max(a, b)] = min(a, b)
+            buckets.setdefault(key, []).append(i)
+
+    clusters = {}
+    for i, entry in enumerate(entries):
+        clusters.setdefault(find(i), []).append(entry)
+
+    merged = []
+    for root in sorted(clusters):
+        members = clusters[root]
+        representative = feedparser.FeedParserDict(members[0])
+        representative["cluster_sources"] = [
+            {"title": source_name(member), "link": member.get("link")} for member in members
+        ]
+        merged.append(representative)
+    return merged
@@ -0,0 +1,144 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_engine import DEFAULT_MODELS, ENGINES, GEMINI
+from analysis import entry_key
+from batching import MAX_ENTRIES, analyze_batches
+from dedup import cluster_entries
+from metrics import METRICS
+from rate_limit import SCHEDULER
+from rss_fetch import fetch_entries, normalize_keyword
+from surveillance_store import SurveillanceStore
+from watchlist import get_matcher
+
+# --- DAEMON SURVEILANS (TANPA UI) ---
+# Contoh: python firewatch_daemon.py --watchlist watchlist.example.json
+# Kunci API dibaca dari pembolehubah persekitaran KIF_API_KEY (tiada analisa AI jika kosong).
+
+log = logging.getLogger("kif.daemon")
+
+DEFAULT_INTERVAL = 900  # saat
+DEFAULT_WORKERS = 4
+
+
+def load_watchlist(path):
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    watches = []
+    for watch in config.get("watches", []):
+        watches.append({
+            # Sama seperti dashboard: "Vape Kedah" dan "vape kedah" ialah siri trend yang sama
+            "keyword": normalize_keyword(watch["keyword"]),
+            "timeframe": watch.get("timeframe", "1d"),
+            "sources": watch.get("sources", ["Semua Platform"]),
+            "terms": [tuple(v.strip() for v in term.split("|") if v.strip()) for term in watch.get("terms", [])],
+        })
+    return config, watches
+
+
+def poll_watch(watch, store, engine, api_key, model):
+    keyword = watch["keyword"]
+    entries = fetch_entries(keyword, watch["timeframe"], watch["sources"])
+    terms = ((keyword,),) + tuple(t for t in watch["terms"] if t)
+    with METRICS.timer("filter"):
+        relevant = get_matcher(terms).filter_entries(entries)
+
+    # Hanya GUID yang belum pernah dilihat ditapis, dikelompok dan dianalisa
+    fresh_keys = store.unseen(keyword, [entry_key(entry) for entry in relevant])
+    fresh = [entry for entry in relevant if entry_key(entry) in fresh_keys]
+    if not fresh:
+        log.info("[%s] %d entri, tiada yang baru", keyword, len(entries))
+        return 0
+
+    with METRICS.timer("cluster"):
+        issues = cluster_entries(fresh)
+    store.add_entries(keyword, issues)
+
+    if api_key:
+        # Saiz kumpulan dirancang ikut bajet token model; kumpulan dihantar serentak dalam had kadar
+        for start in range(0, len(issues), MAX_ENTRIES):
+            chunk = issues[start:start + MAX_ENTRIES]
+            job = SCHEDULER.submit(engine, api_key, model, analyze_batches, chunk, engine, api_key, model, structured=True)
+            verdicts, _, _ = job.future.result()
+            store.add_analyses(keyword, chunk, verdicts, engine, model)
+            if any(verdict is None for verdict in verdicts):
+                # Sebahagian kumpulan gagal: jangan tandakan dilihat; keputusan yang berjaya sudah dalam cache
+                log.warning("[%s] %d isu belum dianalisa, dicuba semula pusingan berikutnya", keyword, verdicts.count(None))
+                return len(issues)
+
+    # Tandakan dilihat selepas disimpan supaya kegagalan analisa akan dicuba semula pada pusingan berikutnya
+    store.mark_seen(keyword, fresh_keys)
+    log.info("[%s] %d entri baru -> %d isu", keyword, len(fresh), len(issues))
+    return len(issues)
+
+
+def poll_once(watches, store, engine, api_key, model, workers):
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kif-watch") as pool:
+        futures = {pool.submit(poll_watch, watch, store, engine, api_key, model): watch for watch in watches}
+    total = 0
+    for future, watch in futures.items():
+        try:
+            total += future.result()
+        except Exception:
+            log.exception("[%s] gagal dipantau", watch["keyword"])
+    return total
+
+
+def write_metrics(args, since):
+    # Prometheus: fail teks ditulis semula (textfile collector); JSONL: rekod baru ditambah
+    if args.metrics_prom:
+        with open(args.metrics_prom + ".tmp", "w", encoding="utf-8") as f:
+            f.write(METRICS.to_prometheus())
+        os.replace(args.metrics_prom + ".tmp", args.metrics_prom)
+    if args.metrics_jsonl:
+        with open(args.metrics_jsonl, "a", encoding="utf-8") as f:
+            f.write(METRICS.to_jsonl(since))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daemon surveilans Kedah Infodemic Firewatch (tanpa UI).")
+    parser.add_argument("--watchlist", required=True, help="Fail JSON senarai pantau.")
+    parser.add_argument("--interval", type=int, help="Selang masa antara pusingan (saat).")
+    parser.add_argument("--workers", type=int, help="Bilangan kata kunci yang dipantau serentak.")
+    parser.add_argument("--engine", choices=ENGINES, help="Enjin AI untuk analisa.")
+    parser.add_argument("--model", help="Model AI (lalai ikut enjin).")
+    parser.add_argument("--store", help="Laluan fail SQLite stor surveilans.")
+    parser.add_argument("--once", action="store_true", help="Jalankan satu pusingan sahaja.")
+    parser.add_argument("--metrics-prom", help="Tulis metrik format Prometheus ke fail ini selepas setiap pusingan.")
+    parser.add_argument("--metrics-jsonl", help="Tambah rekod metrik (JSONL) ke fail ini selepas setiap pusingan.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    config, watches = load_watchlist(args.watchlist)
+    interval = args.interval or config.get("interval", DEFAULT_INTERVAL)
+    workers = args.workers or config.get("workers", DEFAULT_WORKERS)
+    engine = args.engine or config.get("engine", GEMINI)
+    model = args.model or config.get("model") or DEFAULT_MODELS[engine]
+    api_key = os.environ.get("KIF_API_KEY", "")
+    store = SurveillanceStore(args.store) if args.store else SurveillanceStore()
+
+    if not api_key:
+        log.warning("KIF_API_KEY tidak ditetapkan: entri disimpan tanpa analisa AI")
+
+    stop = threading.Event()
+    metrics_since = None
+    while not stop.is_set():
+        started = time.monotonic()
+        with METRICS.timer("poll_round"):
+            total = poll_once(watches, store, engine, api_key, model, workers)
+        log.info("Pusingan siap: %d isu baru dalam %.1f s", total, time.monotonic() - started)
+        written_at = time.time()
+        write_metrics(args, metrics_since)
+        metrics_since = written_at
+        if args.once:
+            break
+        stop.wait(max(0, interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# --- METRIK PRESTASI SETIAP PERINGKAT ---
+METRICS_WINDOW = int(os.environ.get("KIF_METRICS_WINDOW", "2000"))  # sampel terkini bagi setiap peringkat
+
+
+def percentile(values, q):
+    # Kaedah "nearest rank"; values mesti sudah disusun
+    if not values:
+        return None
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in labels) + "}"
+
+
+def format_labels(labels):
+    # Paparan ringkas (panel/penanda aras): "engine=Gemini, model=gemini-2.0-flash"
+    return ", ".join(f"{key}={value}" for key, value in labels)
+
+
+class Metrics:
+    # Tempoh (saat) bagi setiap peringkat (fetch, rss_parse, filter, prompt, llm, parse, format, render, ...) dan kaunter
+    # (token, cubaan semula). Sampel dikumpul mengikut (peringkat, label) supaya, contohnya, kependaman
+    # "llm" setiap enjin/model dilaporkan berasingan. Sumber lain (cache, single-flight) didaftarkan
+    # sebagai fungsi stats().
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))  # (peringkat, label) -> tempoh
+        self._events = deque(maxlen=window * 4)  # rekod mentah untuk eksport JSONL
+        self._counters = defaultdict(float)  # (nama, label) -> nilai
+        self._sources = {}  # nama -> fungsi stats()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, **labels)
+
+    def observe(self, stage, seconds, **labels):
+        with self._lock:
+            self._samples[(stage, tuple(sorted(labels.items())))].append(seconds)
+            self._events.append({"ts": time.time(), "stage": stage, "seconds": round(seconds, 6), **labels})
+
+    def incr(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def register_source(self, name, stats_fn):
+        self._sources[name] = stats_fn
+
+    def summary(self):
+        # {(peringkat, label): statistik}; label ialah tuple (kunci, nilai) yang disusun
+        with self._lock:
+            samples = {key: sorted(values) for key, values in self._samples.items()}
+        return {
+            key: {
+                "count": len(values),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "max": values[-1],
+                "sum": sum(values),
+            }
+            for key, values in samples.items() if values
+        }
+
+    def counters(self):
+        with self._lock:
+            return {(name, labels): value for (name, labels), value in self._counters.items()}
+
+    def sources(self):
+        results = {}
+        for name, stats_fn in list(self._sources.items()):
+            try:
+                results[name] = stats_fn()
+            except Exception:
+                continue
+        return results
+
+    def events(self, since=None):
+        with self._lock:
+            return [event for event in self._events if since is None or event["ts"] > since]
+
+    def to_jsonl(self, since=None):
+        return "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in self.events(since))
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP kif_stage_seconds Tempoh setiap peringkat saluran (tetingkap sampel terkini).",
+            "# TYPE kif_stage_seconds summary",
+        ]
+        for (stage, labels), stats in sorted(self.summary().items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            series = (("stage", stage),) + labels
+            for quantile in ("0.5", "0.95"):
+                value = stats["p50" if quantile == "0.5" else "p95"]
+                lines.append(f"kif_stage_seconds{_label_text(series + (('quantile', quantile),))} {value:.6f}")
+            lines.append(f"kif_stage_seconds_sum{_label_text(series)} {stats['sum']:.6f}")
+            lines.append(f"kif_stage_seconds_count{_label_text(series)} {stats['count']}")
+
+        names = sorted({name for name, _ in self.counters()})
+        counters = self.counters()
+        for name in names:
+            lines.append(f"# TYPE kif_{name}_total counter")
+            for (counter, labels), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(f"kif_{name}_total{_label_text(labels)} {value:g}")
+
+        for source, stats in sorted(self.sources().items()):
+            for key, value in sorted(stats.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE kif_{source}_{key} gauge")
+                    lines.append(f"kif_{source}_{key} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._events.clear()
+            self._counters.clear()
+
+
+METRICS = Metrics()
@@ -0,0 +1,305 @@
+import os
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ai_engine import CHATGPT, DEEPSEEK, GEMINI, key_hash
+from metrics import METRICS
+
+# --- KONFIGURASI PENJADUAL ---
+MAX_RETRIES = int(os.environ.get("KIF_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.environ.get("KIF_BACKOFF_BASE", "2"))  # saat
+BACKOFF_MAX = float(os.environ.get("KIF_BACKOFF_MAX", "60"))  # saat
+
+# Had permintaan seminit (RPM) bagi setiap kunci API + model
+DEFAULT_RPM = {
+    GEMINI: int(os.environ.get("KIF_RPM_GEMINI", "15")),
+    CHATGPT: int(os.environ.get("KIF_RPM_CHATGPT", "60")),
+    DEEPSEEK: int(os.environ.get("KIF_RPM_DEEPSEEK", "60")),
+}
+
+_RETRY_AFTER_PATTERNS = [
+    re.compile(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE),
+    re.compile(r"retry (?:again )?in (\d+(?:\.\d+)?)\s*(ms|s)", re.IGNORECASE),
+]
+_TRANSIENT_MARKERS = ["500", "502", "503", "504", "overloaded", "unavailable", "timed out", "timeout", "connection"]
+
+
+def is_quota_exhausted(exc):
+    # Baki akaun habis (OpenAI) juga dipulangkan sebagai 429, tetapi tidak akan pulih dengan cuba semula
+    return "insufficient_quota" in str(exc).lower()
+
+
+def is_rate_limited(exc):
+    if is_quota_exhausted(exc):
+        return False
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    message = str(exc)
+    return status == 429 or "429" in message or "RESOURCE_EXHAUSTED" in message
+
+
+def is_transient(exc):
+    message = str(exc).lower()
+    return any(marker in message for marker in _TRANSIENT_MARKERS)
+
+
+def retry_after_seconds(exc):
+    # OpenAI/DeepSeek: header Retry-After; Gemini: RetryInfo.retryDelay dalam badan ralat
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        if headers.get("retry-after-ms"):
+            try:
+                return float(headers["retry-after-ms"]) / 1000
+            except ValueError:
+                pass
+        if headers.get("retry-after"):
+            try:
+                return float(headers["retry-after"])
+            except ValueError:
+                pass
+
+    text = f"{exc} {getattr(exc, 'details', '')}"
+    for pattern in _RETRY_AFTER_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            value = float(match.group(1))
+            if len(match.groups()) > 1 and match.group(2) == "ms":
+                value /= 1000
+            return value
+    return None
+
+
+def backoff_delay(attempt):
+    # Exponential backoff dengan "full jitter"
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, rate_per_minute)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self):
+        # Ambil satu token; pulangkan masa (saat) yang perlu ditunggu sebelum boleh guna
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self.paused_until - now)
+            self.tokens -= 1
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.rate)
+            return wait
+
+    def pause(self, seconds):
+        # Penyedia minta tunggu: semua permintaan lain bagi kunci yang sama ikut tunggu
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class Job:
+    # Status satu permintaan yang dijadualkan; dibaca oleh UI tanpa menyekat
+    def __init__(self, engine, cancel_event=None):
+        self.engine = engine
+        self.future = Future()
+        self.attempt = 0
+        self.max_retries = MAX_RETRIES
+        self.next_retry_at = None
+        self.retry_delay = 0
+        self.last_error = None
+        self._cancelled = cancel_event or threading.Event()
+
+    def done(self):
+        return self.future.done()
+
+    def seconds_until_retry(self):
+        if self.next_retry_at is None:
+            return 0
+        return max(0, self.next_retry_at - time.monotonic())
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def current(self):
+        # Job yang status cubaan semulanya dipaparkan di UI
+        return self
+
+
+class HedgedJob(Job):
+    # Job mod "Auto": engine dikemas kini kepada enjin yang menang
+    def __init__(self, engine, legs):
+        super().__init__(engine)
+        self.max_retries = 0
+        self.legs = legs
+        self.leg_jobs = []
+
+    def cancel(self):
+        super().cancel()
+        for leg_job in self.leg_jobs:
+            leg_job.cancel()
+
+    def current(self):
+        # Enjin yang terakhir dihantar (satu-satunya yang mungkin sedang menunggu cubaan semula)
+        return self.leg_jobs[-1] if self.leg_jobs else self
+
+
+class Scheduler:
+    def __init__(self, max_workers=16, batch_workers=16):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kif-llm")
+        # Kumpulan kecil (sub-job) yang dihantar dari dalam job lain mesti berjalan dalam pool
+        # berasingan: job induk menunggu sub-job, jadi berkongsi pool yang sama boleh menyebabkan deadlock
+        self._batch_pool = ThreadPoolExecutor(max_workers=batch_workers, thread_name_prefix="kif-batch")
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, engine, api_key, model):
+        key = (engine, key_hash(api_key), model)
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(DEFAULT_RPM.get(engine, 60))
+            return self._buckets[key]
+
+    def submit(self, engine, api_key, model, fn, *args, **kwargs):
+        # Jika fn menerima cancel_event (cth. strim), job berkongsi event yang sama
+        # supaya pembatalan turut menghentikan panggilan yang sedang berjalan
+        job = Job(engine, kwargs.get("cancel_event"))
+        bucket = self.bucket(engine, api_key, model)
+        self._pool.submit(self._run, job, bucket, fn, args, kwargs)
+        return job
+
+    def submit_batch(self, engine, api_key, model, fn, *args, **kwargs):
+        # Seperti submit(), tetapi untuk sub-job yang ditunggu oleh job yang sedang berjalan dalam
+        # SCHEDULER. Token bucket (had kadar) dikongsi; hanya thread pelaksana yang berbeza.
+        job = Job(engine, kwargs.get("cancel_event"))
+        bucket = self.bucket(engine, api_key, model)
+        self._batch_pool.submit(self._run, job, bucket, fn, args, kwargs)
+        return job
+
+    def submit_hedged(self, legs, hedge_delay):
+        # legs: senarai dict(engine, api_key, model, fn, args, kwargs) mengikut keutamaan.
+        # Enjin utama dihantar dahulu; enjin seterusnya dihantar selepas hedge_delay saat atau
+        # serta-merta jika enjin sebelumnya gagal (429, insufficient_quota, ralat lain).
+        # Respons pertama yang berjaya digunakan dan yang lain dibatalkan.
+        job = HedgedJob(legs[0]["engine"], legs)
+        threading.Thread(
+            target=self._run_hedged, args=(job, legs, hedge_delay), daemon=True, name="kif-hedge"
+        ).start()
+        return job
+
+    def _launch_leg(self, job, index, results):
+        leg = job.legs[index]
+        leg_job = Job(leg["engine"], leg["kwargs"].get("cancel_event"))
+        if index < len(job.legs) - 1:
+            leg_job.max_retries = 0  # gagal terus ke enjin seterusnya, bukan cuba semula
+        # Enjin terakhir tiada sandaran: kekalkan cubaan semula latar belakang (MAX_RETRIES)
+        leg_job.future.add_done_callback(lambda future: results.put((index, future)))
+        job.leg_jobs.append(leg_job)
+        if job._cancelled.is_set():
+            # HedgedJob.cancel() mungkin berlaku sebelum enjin ini ditambah ke leg_jobs
+            leg_job.cancel()
+        bucket = self.bucket(leg["engine"], leg["api_key"], leg["model"])
+        self._pool.submit(self._run, leg_job, bucket, leg["fn"], leg["args"], leg["kwargs"])
+
+    def _run_hedged(self, job, legs, hedge_delay):
+        results = queue.Queue()
+        launched = 0
+        finished = 0
+        last_error = None
+        failed_leg = None
+
+        self._launch_leg(job, launched, results)
+        launched += 1
+        deadline = time.monotonic() + hedge_delay
+        while True:
+            timeout = max(0, deadline - time.monotonic()) if launched < len(legs) else None
+            try:
+                index, future = results.get(timeout=timeout)
+            except queue.Empty:
+                if job._cancelled.is_set():
+                    # Dibatalkan semasa menunggu: jangan hantar enjin sandaran
+                    job.future.cancel()
+                    return
+                # Enjin semasa terlalu lambat: hantar permintaan hedge ke enjin seterusnya
+                self._launch_leg(job, launched, results)
+                launched += 1
+                deadline = time.monotonic() + hedge_delay
+                continue
+
+            finished += 1
+            if job._cancelled.is_set():
+                job.future.cancel()
+                return
+            if not future.cancelled() and future.exception() is None:
+                job.engine = legs[index]["engine"]
+                for other in job.leg_jobs:
+                    if other is not job.leg_jobs[index]:
+                        other.cancel()
+                job.future.set_result(future.result())
+                return
+
+            if not future.cancelled():
+                last_error = job.last_error = future.exception()
+                failed_leg = index
+            if launched < len(legs) and not job._cancelled.is_set():
+                self._launch_leg(job, launched, results)
+                launched += 1
+                deadline = time.monotonic() + hedge_delay
+            elif finished == launched:
+                if failed_leg is not None:
+                    # Mesej UI (enjin, "Cubaan x/y") mengikut enjin yang benar-benar menghasilkan ralat
+                    job.engine = legs[failed_leg]["engine"]
+                    job.attempt = job.leg_jobs[failed_leg].attempt
+                    job.max_retries = job.leg_jobs[failed_leg].max_retries
+                job.future.set_exception(last_error or RuntimeError("Semua enjin AI gagal"))
+                return
+
+    def _sleep(self, job, seconds):
+        job.retry_delay = seconds
+        job.next_retry_at = time.monotonic() + seconds
+        job._cancelled.wait(seconds)
+        job.next_retry_at = None
+
+    def _run(self, job, bucket, fn, args, kwargs):
+        while True:
+            wait = bucket.reserve()
+            if wait > 0:
+                METRICS.observe("queue_wait", wait, engine=job.engine)
+                self._sleep(job, wait)
+            if job._cancelled.is_set():
+                job.future.cancel()
+                return
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                job.last_error = exc
+                if job._cancelled.is_set():
+                    job.future.cancel()
+                    return
+                delay = retry_after_seconds(exc) if is_rate_limited(exc) else None
+                if delay is not None:
+                    # Ikut masa yang diminta penyedia; token bucket akan menunggu sebelum cubaan seterusnya
+                    bucket.pause(delay + random.uniform(0, 1))
+                if not (is_rate_limited(exc) or is_transient(exc)) or job.attempt >= job.max_retries:
+                    job.future.set_exception(exc)
+                    return
+                job.attempt += 1
+                METRICS.incr("retries", engine=job.engine, reason="rate_limited" if is_rate_limited(exc) else "transient")
+                if delay is None:
+                    self._sleep(job, backoff_delay(job.attempt))
+            else:
+                job.future.set_result(result)
+                return
+
+
+SCHEDULER = Scheduler()
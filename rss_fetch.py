@@ -0,0 +1,219 @@
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import feedparser
+
+from metrics import METRICS
+from singleflight import FETCH_FLIGHT
+
+# --- KONFIGURASI RSS ---
+GOOGLE_NEWS_RSS = os.environ.get("KIF_RSS_URL", "https://news.google.com/rss/search")
+FETCH_TIMEOUT = 10  # saat, had masa soket bagi setiap permintaan RSS
+FEED_CACHE_TTL = int(os.environ.get("KIF_FEED_CACHE_TTL", "120"))  # saat
+FEED_CACHE_SIZE = int(os.environ.get("KIF_FEED_CACHE_SIZE", "256"))  # bilangan URL
+
+PLATFORM_FILTERS = {
+    "TikTok": "site:tiktok.com",
+    "Facebook": "site:facebook.com",
+    "X (Twitter)": "(site:x.com OR site:twitter.com)",
+}
+
+# Pool dikongsi oleh semua sesi supaya bilangan sambungan serentak terhad
+_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="kif-rss")
+
+
+def normalize_keyword(keyword):
+    # Carian Google News tidak sensitif huruf/ruang: kunci yang sama = URL yang sama (cache & single-flight)
+    return " ".join((keyword or "").casefold().split())
+
+
+def download_feed(url, etag=None, modified=None, timeout=FETCH_TIMEOUT):
+    # Muat turun sendiri (bukan feedparser.parse(url)) supaya setiap permintaan ada had masa soket:
+    # pelayan yang menerima sambungan tetapi tidak membalas tidak boleh menyekat thread selama-lamanya.
+    # Pulangkan (status, headers, body); body None bagi 304.
+    headers = {"User-Agent": feedparser.USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, dict(exc.headers or {}), None
+
+
+def build_feed_url(query):
+    return f"{GOOGLE_NEWS_RSS}?q={urllib.parse.quote(query)}&hl=ms&gl=MY&ceid=MY:ms"
+
+
+def build_query_plan(keyword, tf_code, sources):
+    # Satu pasangan (exact, relaxed) bagi setiap platform yang dipilih
+    site_filters = []
+    if "Semua Platform" in sources:
+        site_filters = [""] + list(PLATFORM_FILTERS.values())
+    else:
+        if "Portal Berita" in sources:
+            site_filters.append("")
+        for name, site_filter in PLATFORM_FILTERS.items():
+            if name in sources:
+                site_filters.append(site_filter)
+
+    plan = []
+    for site_filter in site_filters:
+        # Gunakan quotes untuk ketepatan kata kunci (Exact Match)
+        exact = " ".join(p for p in [f'"{keyword}"', site_filter, f"when:{tf_code}"] if p)
+        # Versi longgar (tanpa quotes) jika carian spesifik tiada hasil
+        relaxed = " ".join(p for p in [keyword, site_filter, f"when:{tf_code}"] if p)
+        plan.append((build_feed_url(exact), build_feed_url(relaxed)))
+    return plan
+
+
+class FeedCache:
+    # Cache LRU + TTL bagi feed RSS, dikongsi oleh semua sesi dalam proses yang sama.
+    # Selepas TTL tamat, feed disahkan semula dengan conditional GET (ETag/Last-Modified)
+    # supaya feed yang tidak berubah hanya kos satu respons 304.
+
+    def __init__(self, ttl=FEED_CACHE_TTL, max_entries=FEED_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._items = OrderedDict()  # url -> dict(fetched_at, etag, modified, entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.stale = 0
+        self.misses = 0
+
+    def get(self, url):
+        with self._lock:
+            item = self._items.get(url)
+            if item is not None:
+                self._items.move_to_end(url)
+                if time.monotonic() - item["fetched_at"] < self.ttl:
+                    self.hits += 1
+                    return item["entries"]
+
+        # Sesi lain yang meminta URL yang sama semasa ini berkongsi satu permintaan rangkaian
+        return FETCH_FLIGHT.do(url, self._refresh, url, item)
+
+    def _refresh(self, url, item):
+        # "fetch" = muat turun sahaja; penghuraian XML direkod berasingan sebagai "rss_parse"
+        with METRICS.timer("fetch", revalidate=item is not None):
+            etag, modified = (item["etag"], item["modified"]) if item is not None else (None, None)
+            try:
+                status, headers, body = download_feed(url, etag, modified)
+            except (OSError, ValueError):
+                # Ralat rangkaian/had masa: salinan lama (jika ada) atau feed kosong, tidak dicache
+                status, headers, body = None, {}, None
+        entries = []
+        if body is not None:
+            with METRICS.timer("rss_parse"):
+                entries = feedparser.parse(body, response_headers=headers).entries
+        headers = {key.lower(): value for key, value in headers.items()}
+
+        if item is not None and status == 304:
+            entries = item["entries"]
+            with self._lock:
+                self.revalidated += 1
+        elif item is not None and status != 200:
+            # Pengesahan semula gagal: guna salinan lama yang baik; fetched_at tidak dikemas kini
+            # supaya permintaan seterusnya cuba semula
+            with self._lock:
+                self.stale += 1
+            return item["entries"]
+        else:
+            with self._lock:
+                self.misses += 1
+
+        # Jangan cache ralat rangkaian atau respons HTTP yang gagal (urlopen sudah mengikut redirect)
+        if status in (200, 304):
+            self._store(url, {
+                "fetched_at": time.monotonic(),
+                "etag": headers.get("etag") or (item or {}).get("etag"),
+                "modified": headers.get("last-modified") or (item or {}).get("modified"),
+                "entries": entries,
+            })
+        return entries
+
+    def _store(self, url, item):
+        with self._lock:
+            self._items[url] = item
+            self._items.move_to_end(url)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "stale": self.stale,
+                "misses": self.misses,
+            }
+
+
+FEED_CACHE = FeedCache()
+METRICS.register_source("feed_cache", FEED_CACHE.stats)
+
+
+def fetch_feed(url):
+    return FEED_CACHE.get(url)
+
+
+def _entry_key(entry):
+    return entry.get("id") or entry.get("link") or entry.get("title")
+
+
+def fetch_entries(keyword, tf_code, sources, timeout=FETCH_TIMEOUT):
+    with METRICS.timer("fetch_all"):
+        return _fetch_entries(keyword, tf_code, sources, timeout)
+
+
+def _fetch_entries(keyword, tf_code, sources, timeout):
+    plan = build_query_plan(normalize_keyword(keyword), tf_code, sources)
+
+    # Hantar semua varian (exact + relaxed) bagi semua platform serentak
+    futures = {}
+    for urls in plan:
+        for url in urls:
+            if url not in futures:
+                futures[url] = _POOL.submit(fetch_feed, url)
+
+    done, pending = wait(futures.values(), timeout=timeout)
+    for future in pending:
+        future.cancel()
+
+    def entries_for(url):
+        future = futures[url]
+        if future not in done or future.exception() is not None:
+            return []
+        return future.result()
+
+    # Gabungkan hasil: utamakan exact, guna relaxed hanya jika exact kosong
+    merged = []
+    seen = set()
+    for exact_url, relaxed_url in plan:
+        entries = entries_for(exact_url)
+        if not entries:
+            # Carian exact kosong: guna hasil versi longgar (sudah diambil serentak)
+            entries = entries_for(relaxed_url)
+            METRICS.incr("relaxed_fallback")
+        for entry in entries:
+            key = _entry_key(entry)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(entry)
+    return merged
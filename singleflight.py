@@ -0,0 +1,76 @@
+import os
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from metrics import METRICS
+
+# --- SINGLE-FLIGHT (GABUNGAN PANGGILAN SERENTAK) ---
+FETCH_FLIGHT_TIMEOUT = float(os.environ.get("KIF_FETCH_FLIGHT_TIMEOUT", "30"))  # saat
+ANALYSIS_FLIGHT_TIMEOUT = float(os.environ.get("KIF_ANALYSIS_FLIGHT_TIMEOUT", "300"))  # saat
+
+
+class SingleFlight:
+    # Satu panggilan sahaja bagi setiap kunci pada satu masa untuk seluruh proses: sesi lain yang
+    # meminta kunci yang sama semasa panggilan masih berjalan menunggu hasil (atau ralat) yang sama.
+    # Tiada apa yang disimpan selepas panggilan siap; caching dikendalikan oleh lapisan lain.
+    # Penunggu berhenti selepas timeout saat; panggilan yang tersangkut dilepaskan daripada kunci
+    # supaya permintaan seterusnya memulakan panggilan baharu dan tidak menumpang panggilan itu.
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._calls = {}  # kunci -> Future
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            try:
+                return future.result(self.timeout)
+            except TimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                    if self._calls.get(key) is future:
+                        del self._calls[key]
+                raise TimeoutError(f"Panggilan dikongsi tamat masa (timeout) selepas {self.timeout:g} s") from None
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                # Kunci mungkin sudah dilepaskan (timeout) dan diambil oleh panggilan baharu
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            total = self.calls + self.coalesced
+            return {
+                "in_flight": len(self._calls),
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "coalesced_rate": self.coalesced / total if total else 0.0,
+            }
+
+
+FETCH_FLIGHT = SingleFlight(FETCH_FLIGHT_TIMEOUT)  # kunci: URL feed (kata kunci ternormal)
+ANALYSIS_FLIGHT = SingleFlight(ANALYSIS_FLIGHT_TIMEOUT)  # kunci: (cache_key(prompt ternormal, enjin, model), key_hash(api_key))
+METRICS.register_source("fetch_flight", FETCH_FLIGHT.stats)
+METRICS.register_source("analysis_flight", ANALYSIS_FLIGHT.stats)
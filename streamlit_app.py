@@ -1,9 +1,21 @@
+import functools
+import threading
+import urllib.request
+from datetime import datetime
+
 import streamlit as st
-import feedparser
-import urllib.parse
-from google import genai
-from openai import OpenAI
-import time
+
+from ai_cache import ANALYSIS_CACHE
+from ai_engine import AUTO, DEFAULT_MODELS, ENGINES, GEMINI, list_models
+from analysis import cached_verdicts, parse_partial_json_verdicts, render_verdicts
+from batching import MAX_ENTRIES, analyze_batches, rank_by_risk
+from dedup import cluster_entries
+from metrics import METRICS, format_labels
+from rate_limit import SCHEDULER, is_quota_exhausted, is_rate_limited
+from rss_fetch import fetch_entries, normalize_keyword
+from singleflight import ANALYSIS_FLIGHT, FETCH_FLIGHT
+from surveillance_store import SurveillanceStore
+from watchlist import get_matcher, parse_watchlist
 
 # --- PAGE CONFIG ---
 st.set_page_config(
@@ -13,124 +25,385 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+LOGO_URL = "https://1.bp.blogspot.com/-3jdAodgrlNc/YCNqEAeitTI/AAAAAAAAdqc/A02ZZrvJZs4sL48I6OpR9ob_fhYfRDFWgCNcBGAsYHQ/s16000/JKN%2BKEDAH.png"
+
+
+@st.cache_data
+def load_css(path):
+    with open(path) as f:
+        return f.read()
+
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def load_logo(url):
+    # Logo dimuat turun sekali dan dihidang dari cache; jika gagal, pelayar memuatkan URL terus
+    try:
+        with urllib.request.urlopen(url, timeout=3) as response:
+            return response.read()
+    except Exception:
+        return url
+
 # --- LOAD CSS ---
-with open("style.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+st.markdown(f"<style>{load_css('style.css')}</style>", unsafe_allow_html=True)
 
 # --- SESSION STATE ---
 if 'api_key' not in st.session_state:
     st.session_state.api_key = ""
 if 'keyword' not in st.session_state:
     st.session_state.keyword = "vape kedah"
+if 'watchlist' not in st.session_state:
+    st.session_state.watchlist = ""
 if 'last_results' not in st.session_state:
     st.session_state.last_results = []
+if 'results_keyword' not in st.session_state:
+    st.session_state.results_keyword = ""
 if 'ai_analysis' not in st.session_state:
     st.session_state.ai_analysis = ""
 if 'news_context' not in st.session_state:
     st.session_state.news_context = ""
+if 'verdicts' not in st.session_state:
+    st.session_state.verdicts = []
 if 'ai_engine' not in st.session_state:
     st.session_state.ai_engine = "Gemini (Google)"
-if 'retry_active' not in st.session_state:
-    st.session_state.retry_active = False
-if 'retry_count' not in st.session_state:
-    st.session_state.retry_count = 0
+if 'api_keys' not in st.session_state:
+    st.session_state.api_keys = {}
+if 'hedge_delay' not in st.session_state:
+    st.session_state.hedge_delay = 8
+if 'analysis_engine' not in st.session_state:
+    st.session_state.analysis_engine = ""
+if 'ai_job' not in st.session_state:
+    st.session_state.ai_job = None
+if 'stream_mode' not in st.session_state:
+    st.session_state.stream_mode = True
+if 'structured_mode' not in st.session_state:
+    st.session_state.structured_mode = True
+if 'stream_stats' not in st.session_state:
+    st.session_state.stream_stats = {}
 if 'debug_mode' not in st.session_state:
     st.session_state.debug_mode = False
 if 'error_feedback' not in st.session_state:
     st.session_state.error_feedback = None
 
 # --- FUNCTIONS ---
-def run_ai_analysis(retry_count=0):
-    if not st.session_state.api_key:
+@st.cache_resource
+def get_store():
+    return SurveillanceStore()
+
+
+def model_for(engine):
+    return gemini_model if engine == GEMINI else DEFAULT_MODELS[engine]
+
+
+def configured_engines():
+    # Mod Auto: semua enjin yang ada kunci, mengikut keutamaan; selain itu hanya enjin dipilih
+    if st.session_state.ai_engine == AUTO:
+        return [(engine, st.session_state.api_keys.get(engine)) for engine in ENGINES if st.session_state.api_keys.get(engine)]
+    if st.session_state.api_key:
+        return [(st.session_state.ai_engine, st.session_state.api_key)]
+    return []
+
+
+def run_ai_analysis():
+    engines = configured_engines()
+    if not engines:
         st.error(f"Ralat: Sila masukkan API Key untuk {st.session_state.ai_engine} di bar sisi.")
         return
 
+    entries = st.session_state.last_results
+    # Kata kunci carian yang menghasilkan isu ini (bukan nilai bar sisi semasa, yang mungkin sudah diubah)
+    keyword = st.session_state.results_keyword
+    st.session_state.ai_analysis = ""
+    st.session_state.error_feedback = None
+    st.session_state.stream_stats = {}
+
+    # Semua isu sudah ada keputusan dalam cache: tiada permintaan AI diperlukan
+    for engine, _ in engines:
+        verdicts = cached_verdicts(entries, engine, model_for(engine), record_hits=False)
+        if all(verdict is not None for verdict in verdicts):
+            ANALYSIS_CACHE.record_hits(len(verdicts))
+            finish_ai_analysis(keyword, entries, engine, verdicts, 0, None)
+            return
+
+    # Hanya isu baru dihantar ke AI; penjadual mengendalikan had kadar dan cubaan semula di latar belakang
+    auto = st.session_state.ai_engine == AUTO
+    prompts = []
+    chunks = {}
+    stats = {}
+    stream_entries = {}
+    legs = []
+    for engine, api_key in engines:
+        model = model_for(engine)
+        # cancel_event sentiasa dikongsi supaya pembatalan turut menghentikan kumpulan yang dijadualkan
+        kwargs = {"on_prompt": prompts.append, "cancel_event": threading.Event(), "structured": st.session_state.structured_mode}
+        # Mod Auto sentiasa berstrim supaya permintaan yang kalah boleh dihentikan serta-merta
+        if st.session_state.stream_mode or auto:
+            chunks[engine] = []
+            stats[engine] = {}
+            kwargs.update(on_chunk=chunks[engine].append, stats=stats[engine],
+                          on_stream_entries=functools.partial(stream_entries.__setitem__, engine))
+        legs.append({
+            "engine": engine, "api_key": api_key, "model": model,
+            "fn": analyze_batches, "args": (entries, engine, api_key, model), "kwargs": kwargs,
+        })
+
+    if auto:
+        job = SCHEDULER.submit_hedged(legs, st.session_state.hedge_delay)
+    else:
+        leg = legs[0]
+        job = SCHEDULER.submit(leg["engine"], leg["api_key"], leg["model"], leg["fn"], *leg["args"], **leg["kwargs"])
+    st.session_state.ai_job = {
+        "job": job, "keyword": keyword, "entries": entries, "prompts": prompts, "chunks": chunks, "stats": stats,
+        "stream_entries": stream_entries,
+        "structured": st.session_state.structured_mode,
+    }
+
+
+def finish_ai_analysis(keyword, entries, engine, verdicts, new_count, raw_text):
+    # Paparan disusun mengikut risiko tertinggi merentasi semua kumpulan
+    entries, verdicts = rank_by_risk(entries, verdicts)
+    st.session_state.last_results = entries
+    st.session_state.verdicts = verdicts
+    st.session_state.analysis_engine = engine
+
+    # Simpan ke stor sejarah supaya trend boleh dilihat tanpa mengambil/menganalisa semula
+    store = get_store()
+    store.add_entries(keyword, entries)
+    store.add_analyses(keyword, entries, verdicts, engine, model_for(engine))
+    if any(verdict is not None for verdict in verdicts):
+        # Hanya membina teks Markdown; masa paparan sebenar direkod oleh fragmen ("render")
+        with METRICS.timer("format"):
+            st.session_state.ai_analysis = render_verdicts(entries, verdicts)
+    else:
+        # Format tidak dikenali: paparkan respons asal seperti biasa
+        st.session_state.ai_analysis = raw_text or ""
+
+    if st.session_state.ai_analysis:
+        st.success(f"✅ ANALISIS {engine.upper()} SIAP")
+        if new_count < len(entries):
+            st.caption(f"♻️ {len(entries) - new_count} isu diambil dari cache, {new_count} isu baru dianalisa.")
+    else:
+        st.warning("⚠️ AI memulangkan respons kosong.")
+
+
+def collect_ai_job():
+    pending = st.session_state.ai_job
+    st.session_state.ai_job = None
+    job = pending["job"]
+    if pending["prompts"]:
+        st.session_state.news_context = "\n---\n".join(pending["prompts"])
+    if job.future.cancelled():
+        st.session_state.error_feedback = ("error", "⛔ ANALISA DIBATALKAN", "Klik 'Cuba Analisa Semula' untuk mula semula.")
+        return
+
     try:
-        # Prompt yang lebih ringkas dan direct untuk kurangkan ralat safety filter
-        prompt = f"""
-        TUGAS: Analisis isu kesihatan awam dari berita berikut:
-        {st.session_state.news_context}
-        
-        FORMAT (Markdown):
-        - **Isu**: (Tajuk)
-        - **Sentimen**: (Positif/Negatif/Neutral)
-        - **Tahap Risiko**: (Skor 1-10)
-        - **Cadangan**: (Tindakan JKN Kedah)
-        - **Fakta**: (Sahih/Rumor)
-        """
-        
-        if st.session_state.debug_mode:
-            st.info("🔍 PROMPT DIHANTAR:")
-            st.code(prompt)
-
-        with st.spinner(f"🧠 {st.session_state.ai_engine} sedang menganalisa isu..."):
-            if st.session_state.ai_engine == "Gemini (Google)":
-                client = genai.Client(api_key=st.session_state.api_key)
-                response = client.models.generate_content(model=gemini_model, contents=prompt)
-                st.session_state.ai_analysis = response.text
-            
-            elif st.session_state.ai_engine == "ChatGPT (OpenAI)":
-                client = OpenAI(api_key=st.session_state.api_key)
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                st.session_state.ai_analysis = response.choices[0].message.content
-            
-            elif st.session_state.ai_engine == "DeepSeek":
-                client = OpenAI(api_key=st.session_state.api_key, base_url="https://api.deepseek.com")
-                response = client.chat.completions.create(
-                    model="deepseek-chat",
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                st.session_state.ai_analysis = response.choices[0].message.content
-
-        if st.session_state.ai_analysis:
-            st.success(f"✅ ANALISIS {st.session_state.ai_engine.upper()} SIAP")
-            st.session_state.retry_count = 0
-            st.session_state.retry_active = False
-        else:
-            st.warning("⚠️ AI memulangkan respons kosong.")
-                
+        verdicts, new_count, raw_text = job.future.result()
+        st.session_state.stream_stats = pending["stats"].get(job.engine, {})
+        finish_ai_analysis(pending["keyword"], pending["entries"], job.engine, verdicts, new_count, raw_text)
     except Exception as e:
         error_msg = str(e)
         st.session_state.ai_analysis = ""
-        
+
         # Kes Khas OpenAI (Insufficient Balance)
-        if "insufficient_quota" in error_msg.lower():
+        if is_quota_exhausted(e):
             st.session_state.error_feedback = ("error", "💳 BAKI AKAUN TIADA (OpenAI/ChatGPT)", "Nota: Akaun ChatGPT API anda perlu diisi prabayar (min $5). Sila semak status di platform.openai.com.")
-            st.session_state.retry_active = False
-            return
+        elif is_rate_limited(e):
+            st.session_state.error_feedback = ("limit", f"❌ HAD CUBAAN MAKSIMUM ({job.max_retries}) DICAPAI", "Sila tunggu 1 minit dan klik 'Cuba Analisa Semula' secara manual.")
+        else:
+            st.session_state.error_feedback = ("error", f"❌ RALAT TEKNIKAL: {job.engine}", error_msg)
+
+
+@st.fragment(run_every=0.5)
+def show_ai_job():
+    # Dikemas kini setiap saat tanpa menyekat halaman; bila kerja siap, seluruh skrip dijalankan semula
+    # Tidak direkod sebagai "render": tinjauan setiap 0.5 s akan menenggelamkan sampel paparan sebenar
+    pending = st.session_state.ai_job
+    if pending is None:
+        return
+    job = pending["job"]
+    if job.done():
+        st.rerun()
+
+    # Mod Auto: status cubaan semula diambil daripada enjin yang sedang berjalan
+    current = job.current()
+    remaining = current.seconds_until_retry()
+    if remaining and current.attempt:
+        st.warning(f"🚨 HAD KUOTA DICAPAI (Cubaan {current.attempt}/{current.max_retries}). Cuba semula automatik dalam {remaining:.0f} saat...")
+        st.progress(1 - remaining / current.retry_delay if current.retry_delay else 0.0)
+    elif remaining:
+        st.info(f"⏳ Menunggu giliran kuota {current.engine} ({remaining:.0f} saat)...")
+    elif any(pending["chunks"].values()):
+        # Paparkan respons separa semasa strim diterima (mod Auto: enjin yang paling jauh ke depan)
+        engine, partial = max(((engine, "".join(chunks)) for engine, chunks in pending["chunks"].items()), key=lambda item: len(item[1]))
+        if pending["structured"]:
+            # Mod JSON: rekod yang sudah lengkap dipaparkan sebagai kad; JSON mentah hanya sebelum rekod pertama siap
+            entries = pending["stream_entries"].get(engine, [])
+            parsed = [(entry, verdict) for entry, verdict in zip(entries, parse_partial_json_verdicts(partial, len(entries))) if verdict]
+            if parsed:
+                st.markdown(render_verdicts(*zip(*parsed)) + " ▌")
+            else:
+                st.code(partial, language="json")
+        else:
+            st.markdown(partial + " ▌")
+    else:
+        st.info(f"🧠 {job.engine} sedang menganalisa isu...")
+
+    if st.button("⛔ BATALKAN ANALISA"):
+        job.cancel()
+
+
+def retry_ai_analysis():
+    # Callback dijalankan sebelum rerun fragmen, jadi status kerja baru terus dipaparkan
+    st.session_state.error_feedback = None
+    run_ai_analysis()
+
+
+@st.fragment
+@METRICS.timer("render", part="results")
+def show_results():
+    # Fragmen: butang cuba semula hanya menjalankan semula bahagian keputusan, bukan seluruh halaman.
+    # Kiraan detik cubaan semula (show_ai_job) ialah fragmen bersarang yang dikemas kini sendiri.
+    st.subheader(f"🔍 {len(st.session_state.last_results)} ISU REAL-TIME DIKESAN")
+    for i, entry in enumerate(st.session_state.last_results):
+        with st.expander(f"📌 {entry.title}", expanded=(i==0)):
+            st.write(f"**Sumber Berita:** {entry.get('source', {}).get('title', 'Berita Tempatan')}")
+            st.markdown(f"**Pautan Terus:** [KLIK SINI UNTUK BACA BERITA PENUH]({entry.link})")
+            if entry.get("watch_hits"):
+                st.markdown(f"**Padanan Senarai Pantau:** {', '.join(entry['watch_hits'])}")
+            others = entry.get("cluster_sources", [])[1:]
+            if others:
+                st.markdown("**Turut Dilaporkan Oleh:** " + ", ".join(f"[{source['title']}]({source['link']})" for source in others))
 
-        if "429" in error_msg:
-            if st.session_state.retry_count < 3:
-                st.session_state.retry_count += 1
-                st.session_state.retry_active = True
-                # Kita tidak st.rerun di sini lagi, kita biarkan Display Section kendalikan countdown
+    st.markdown("---")
+    st.subheader(f"🧠 ANALISA SENTIMEN {(st.session_state.analysis_engine or st.session_state.ai_engine).upper()}")
+
+    if st.session_state.ai_analysis:
+        st.markdown(st.session_state.ai_analysis)
+        stream_stats = st.session_state.stream_stats
+        if stream_stats.get("ttlt") is not None:
+            st.caption(f"⏱️ Token pertama: {stream_stats.get('ttft', 0):.2f} s | Siap: {stream_stats['ttlt']:.2f} s")
+        if st.session_state.debug_mode and st.session_state.news_context:
+            with st.expander("🔍 PROMPT DIHANTAR"):
+                st.code(st.session_state.news_context)
+    elif st.session_state.ai_job is not None:
+        # Status cubaan semula dipaparkan di sini (Bahagian bawah) tanpa menyekat halaman
+        show_ai_job()
+    elif 'error_feedback' in st.session_state and st.session_state.error_feedback:
+        etype, title, msg = st.session_state.error_feedback
+        st.error(title)
+        st.info(msg)
+        # Jangan delete lagi supaya user nampak, kita delete bila Firewatch baru bermula
+        st.button("🔄 CUBA ANALISA SEMULA", on_click=retry_ai_analysis)
+    else:
+        st.info("Analisa AI tidak tersedia buat masa ini.")
+        st.button("🔄 CUBA ANALISA SEMULA", on_click=retry_ai_analysis)
+
+
+@st.fragment
+@METRICS.timer("render", part="history")
+def show_history():
+    # Fragmen: menukar kata kunci/tempoh hanya menjalankan semula bahagian ini
+    with st.expander("📈 SEJARAH & TREND SURVEILANS (STOR TEMPATAN)"):
+        # Semua data dibaca terus dari stor SQLite berindeks: tiada panggilan rangkaian atau AI
+        store = get_store()
+        col1, col2 = st.columns(2)
+        with col1:
+            history_keyword = st.selectbox("KATA KUNCI", options=["Semua"] + store.keywords())
+        with col2:
+            history_days = st.slider("TEMPOH (HARI)", min_value=1, max_value=90, value=7)
+        history_keyword = None if history_keyword == "Semua" else history_keyword
+
+        tab_trend, tab_top, tab_latest = st.tabs(["Trend Risiko & Sentimen", "Risiko Tertinggi", "Terkini (Daemon)"])
+        with tab_trend:
+            risk_rows = store.risk_trend(days=history_days, keyword=history_keyword)
+            if risk_rows:
+                st.line_chart(risk_rows, x="day", y=["avg_risk", "max_risk"])
+                st.bar_chart(store.sentiment_trend(days=history_days, keyword=history_keyword), x="day", y=["Negatif", "Neutral", "Positif"])
+            else:
+                st.caption("Tiada analisa dalam tempoh ini.")
+        with tab_top:
+            top_rows = store.top_risks(days=history_days, keyword=history_keyword)
+            for row in top_rows:
+                published = datetime.fromtimestamp(row["published"]).strftime("%Y-%m-%d %H:%M")
+                st.markdown(f"**{row['risk']}/10** · [{row['title']}]({row['link']}) · {row['sentiment']} · {row['keyword']} · {published}")
+            if not top_rows:
+                st.caption("Tiada isu berisiko dalam tempoh ini.")
+        with tab_latest:
+            latest_rows = store.latest(limit=50)
+            if latest_rows:
+                for row in latest_rows:
+                    row["published"] = datetime.fromtimestamp(row["published"]).strftime("%Y-%m-%d %H:%M")
+                st.dataframe(latest_rows, width="stretch")
             else:
-                st.session_state.error_feedback = ("limit", "❌ HAD CUBAAN MAKSIMUM (3) DICAPAI", "Sila tunggu 1 minit dan klik 'Cuba Analisa Semula' secara manual.")
-                st.session_state.retry_count = 0
-                st.session_state.retry_active = False
+                st.caption("Tiada data. Jalankan `python firewatch_daemon.py --watchlist watchlist.example.json` untuk pemantauan 24/7.")
+
+
+def show_cache_stats():
+    cache_stats = ANALYSIS_CACHE.stats()
+    st.caption(f"Cache analisa: {cache_stats['hits']} hit / {cache_stats['misses']} miss ({cache_stats['size']} simpanan)")
+    fetch_flight = FETCH_FLIGHT.stats()
+    analysis_flight = ANALYSIS_FLIGHT.stats()
+    st.caption(
+        f"Panggilan dikongsi antara sesi: RSS {fetch_flight['coalesced']}/{fetch_flight['calls'] + fetch_flight['coalesced']}"
+        f" | AI {analysis_flight['coalesced']}/{analysis_flight['calls'] + analysis_flight['coalesced']}"
+    )
+
+
+def show_performance_panel():
+    with st.expander("⏱️ PRESTASI SALURAN"):
+        # Tempoh setiap peringkat (ms) bagi sampel terkini dalam proses ini
+        stage_rows = [
+            {"Peringkat": stage, "Label": format_labels(labels), "Bil": stats["count"], "p50 (ms)": round(stats["p50"] * 1000, 1),
+             "p95 (ms)": round(stats["p95"] * 1000, 1), "Maks (ms)": round(stats["max"] * 1000, 1)}
+            for (stage, labels), stats in sorted(METRICS.summary().items(), key=lambda item: (item[0][0], str(item[0][1])))
+        ]
+        if stage_rows:
+            st.dataframe(stage_rows, hide_index=True, width="stretch")
         else:
-            st.session_state.error_feedback = ("error", f"❌ RALAT TEKNIKAL: {st.session_state.ai_engine}", error_msg)
-            st.session_state.retry_active = False
+            st.caption("Tiada data lagi. Lancarkan Firewatch dahulu.")
+
+        usage = {}
+        retries = 0
+        for (name, labels), value in METRICS.counters().items():
+            labels = dict(labels)
+            if name in ("llm_calls", "llm_input_tokens", "llm_output_tokens"):
+                row = usage.setdefault((labels["engine"], labels["model"]), {"Enjin": labels["engine"], "Model": labels["model"]})
+                row[{"llm_calls": "Panggilan", "llm_input_tokens": "Token Input", "llm_output_tokens": "Token Output"}[name]] = int(value)
+            elif name == "retries":
+                retries += int(value)
+        if usage:
+            st.dataframe(list(usage.values()), hide_index=True, width="stretch")
+
+        sources = METRICS.sources()
+        feed_cache = sources.get("feed_cache", {})
+        feed_total = feed_cache.get("hits", 0) + feed_cache.get("revalidated", 0) + feed_cache.get("misses", 0)
+        st.caption(
+            f"Cache RSS: {feed_cache.get('hits', 0) / feed_total if feed_total else 0:.0%} hit"
+            f" | Cache analisa: {sources.get('analysis_cache', {}).get('hit_rate', 0):.0%} hit"
+            f" | Cubaan semula: {retries}"
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("JSONL", METRICS.to_jsonl, file_name="kif_metrics.jsonl", mime="application/x-ndjson", on_click="ignore")
+        with col2:
+            st.download_button("Prometheus", METRICS.to_prometheus, file_name="kif_metrics.prom", mime="text/plain", on_click="ignore")
+
 
 # --- SIDEBAR ---
 with st.sidebar:
     # Menggunakan PNG link yang lebih stabil untuk logo Kedah
-    st.image("https://1.bp.blogspot.com/-3jdAodgrlNc/YCNqEAeitTI/AAAAAAAAdqc/A02ZZrvJZs4sL48I6OpR9ob_fhYfRDFWgCNcBGAsYHQ/s16000/JKN%2BKEDAH.png", width=100)
+    st.image(load_logo(LOGO_URL), width=100)
     st.title("PANEL CONTROL")
     st.markdown("---")
     
     st.session_state.ai_engine = st.selectbox(
         "PILIH ENJIN AI",
-        options=["Gemini (Google)", "ChatGPT (OpenAI)", "DeepSeek"],
+        options=ENGINES + [AUTO],
         index=0
     )
 
     # Sub-options for Gemini models if selected
-    gemini_model = "gemini-2.0-flash"
-    if st.session_state.ai_engine == "Gemini (Google)":
+    gemini_model = DEFAULT_MODELS[GEMINI]
+    if st.session_state.ai_engine in (GEMINI, AUTO):
         gemini_model = st.selectbox(
             "VERSI GEMINI",
             options=["gemini-2.0-flash", "gemini-1.5-flash", "gemini-1.5-flash-8b", "gemini-1.5-pro"],
@@ -138,31 +411,62 @@ with st.sidebar:
             help="Jika keluar ralat 404, cuba tukar ke versi lain."
         )
 
-    st.session_state.api_key = st.text_input(
-        f"KUNCI API {st.session_state.ai_engine.upper()}", 
-        value=st.session_state.api_key, 
-        type="password",
-        help=f"Pastikan kunci anda sah untuk {st.session_state.ai_engine}."
+    if st.session_state.ai_engine == AUTO:
+        # Mod Auto: enjin pertama yang ada kunci menjadi enjin utama, yang lain sebagai sandaran
+        for engine in ENGINES:
+            st.session_state.api_keys[engine] = st.text_input(
+                f"KUNCI API {engine.upper()}",
+                value=st.session_state.api_keys.get(engine, ""),
+                type="password",
+                help="Biarkan kosong untuk tidak menggunakan enjin ini."
+            )
+        st.session_state.hedge_delay = st.slider(
+            "TEMPOH HEDGE (SAAT)",
+            min_value=1, max_value=30,
+            value=st.session_state.hedge_delay,
+            help="Jika enjin utama belum siap dalam tempoh ini (atau gagal dengan 429), enjin seterusnya turut dihantar."
+        )
+    else:
+        st.session_state.api_key = st.text_input(
+            f"KUNCI API {st.session_state.ai_engine.upper()}", 
+            value=st.session_state.api_key, 
+            type="password",
+            help=f"Pastikan kunci anda sah untuk {st.session_state.ai_engine}."
+        )
+
+    st.session_state.stream_mode = st.checkbox(
+        "⚡ MOD STRIM (PAPAR SERTA-MERTA)",
+        value=st.session_state.stream_mode,
+        help="Paparkan analisa sebaik sahaja AI mula menjawab."
+    )
+
+    st.session_state.structured_mode = st.checkbox(
+        "🧾 MOD JSON BERSTRUKTUR",
+        value=st.session_state.structured_mode,
+        help="AI menjawab dalam JSON (satu rekod bagi setiap isu) yang disahkan; hanya isu yang gagal diminta semula."
     )
     
     with st.expander("🛠️ DEBUG (TEKNIKAL)"):
         if st.button("SENARAI MODEL TERSEDIA"):
-            if not st.session_state.api_key:
+            if not configured_engines():
                 st.error("Masukkan API Key dahulu.")
             else:
                 try:
-                    if st.session_state.ai_engine == "Gemini (Google)":
-                        client = genai.Client(api_key=st.session_state.api_key)
-                        models = client.models.list()
-                        st.write("Model yang kunci anda boleh akses:")
-                        for m in models:
-                            st.code(m.name)
-                    else:
-                        st.info("Ciri ini hanya untuk Gemini buat masa ini.")
+                    # Senarai model disimpan dalam cache (TTL) dan klien dikongsi dari pool
+                    for engine, api_key in configured_engines():
+                        models = list_models(engine, api_key)
+                        st.write(f"Model {engine} yang kunci anda boleh akses:")
+                        for name in models:
+                            st.code(name)
                 except Exception as e:
                     st.error(f"Gagal senaraikan model: {str(e)}")
         
         st.session_state.debug_mode = st.checkbox("🔍 MODE DEBUG (LIHAT PROMPT)", value=st.session_state.debug_mode)
+
+        # Diisi di hujung skrip (selepas larian) supaya statistik larian semasa turut dikira
+        cache_panel = st.empty()
+
+    perf_panel = st.empty()
     
     st.session_state.keyword = st.text_input(
         "KATA KUNCI SURVEILANS", 
@@ -170,6 +474,13 @@ with st.sidebar:
         placeholder="cth: bunuh diri kedah"
     )
 
+    st.session_state.watchlist = st.text_area(
+        "SENARAI PANTAU TAMBAHAN",
+        value=st.session_state.watchlist,
+        placeholder="denggi|dengue|aedes\nkeracunan makanan\nAlor Setar|Alor Star",
+        help="Satu istilah sebaris. Ejaan alternatif dipisahkan dengan '|'. Berita yang menyebut mana-mana istilah turut dikira relevan."
+    )
+
     timeframe = st.selectbox(
         "TEMPOH MASA",
         options=["1 hari", "3 hari", "7 hari", "30 hari"],
@@ -194,110 +505,52 @@ with st.sidebar:
 st.title("🛡️ Kedah Infodemic Firewatch")
 st.markdown("### Sistem Pemantauan Isu Kesihatan Awam")
 
+# Kutip hasil analisa latar belakang yang sudah siap
+if st.session_state.ai_job is not None and st.session_state.ai_job["job"].done():
+    collect_ai_job()
+
 if run_btn:
     st.session_state.ai_analysis = ""
-    st.session_state.retry_count = 0
-    st.session_state.retry_active = False
     st.session_state.error_feedback = None
-    if not st.session_state.api_key:
+    if st.session_state.ai_job is not None:
+        st.session_state.ai_job["job"].cancel()
+        st.session_state.ai_job = None
+    if not configured_engines():
         st.error(f"Ralat: Sila masukkan API Key {st.session_state.ai_engine} di bar sisi.")
     elif not sources:
         st.error("Ralat: Sila pilih sekurang-kurangnya satu sumber surveilans.")
     else:
         with st.spinner(f"⏳ Mencari data di {', '.join(sources)}..."):
-            # Gunakan quotes untuk ketepatan kata kunci (Exact Match)
-            base_query = f'"{st.session_state.keyword}"'
-            
-            # Platform filters
-            site_filters = []
-            if "TikTok" in sources: site_filters.append("site:tiktok.com")
-            if "Facebook" in sources: site_filters.append("site:facebook.com")
-            if "X (Twitter)" in sources: site_filters.append("site:x.com OR site:twitter.com")
-            
-            if "Semua Platform" in sources:
-                # Cari merentasi semua, tapi pastikan kata kunci wujud
-                search_query = f"{base_query} when:{tf_code}"
-            elif site_filters:
-                # Filter platform secara spesifik
-                platform_query = f"({ ' OR '.join(site_filters) })"
-                # Gabungkan kata kunci DENGAN platform (Gunakan AND logic)
-                search_query = f"{base_query} {platform_query} when:{tf_code}"
-            else:
-                # Portal Berita sahaja
-                search_query = f"{base_query} when:{tf_code}"
-
-            encoded_url = f"https://news.google.com/rss/search?q={urllib.parse.quote(search_query)}&hl=ms&gl=MY&ceid=MY:ms"
-            feed = feedparser.parse(encoded_url)
-            
-            # Jika carian spesifik tiada hasil, cuba longgarkan sedikit (tanpa quotes)
-            if not feed.entries:
-                search_query_relaxed = f"{st.session_state.keyword} {' '.join(site_filters)} when:{tf_code}"
-                encoded_url = f"https://news.google.com/rss/search?q={urllib.parse.quote(search_query_relaxed)}&hl=ms&gl=MY&ceid=MY:ms"
-                feed = feedparser.parse(encoded_url)
-
-            if feed.entries:
-                # Filter tambahan secara manual untuk pastikan kata kunci wujud dalam tajuk
+            # Semua varian carian (exact/relaxed, setiap platform) dihantar serentak
+            entries = fetch_entries(st.session_state.keyword, tf_code, sources)
+
+            if entries:
+                # Filter tambahan untuk pastikan kata kunci / istilah senarai pantau wujud dalam tajuk atau ringkasan
                 # (Google RSS kadangkala bagi 'related' content yang tidak tepat)
-                relevant_entries = []
-                kw_lower = st.session_state.keyword.lower()
-                for entry in feed.entries:
-                    if kw_lower in entry.title.lower():
-                        relevant_entries.append(entry)
+                terms = ((st.session_state.keyword,),) + tuple(parse_watchlist(st.session_state.watchlist))
+                with METRICS.timer("filter"):
+                    relevant_entries = get_matcher(terms).filter_entries(entries)
                 
                 # Jika filter manual terlalu ketat (0 hasil), ambil saja apa yang Google bagi
                 if not relevant_entries:
-                    relevant_entries = feed.entries[:5]
-                else:
-                    relevant_entries = relevant_entries[:5]
+                    relevant_entries = entries
+
+                # Gabungkan berita sindiket (tajuk hampir sama dari banyak portal); semua isu dianalisa
+                # dalam kumpulan selari, dengan had keselamatan MAX_ENTRIES
+                with METRICS.timer("cluster"):
+                    relevant_entries = cluster_entries(relevant_entries)[:MAX_ENTRIES]
 
                 st.session_state.last_results = relevant_entries
-                st.session_state.news_context = ""
-                for i, entry in enumerate(st.session_state.last_results):
-                    st.session_state.news_context += f"ISU {i+1}: {entry.title}\n"
+                st.session_state.results_keyword = normalize_keyword(st.session_state.keyword)
                 run_ai_analysis()
             else:
                 st.session_state.last_results = []
                 st.warning(f"Tiada isu ditemui untuk '{st.session_state.keyword}' bagi platform tempoh {timeframe}.")
 
 # --- DISPLAY SECTION ---
+# Masa paparan direkod dalam setiap fragmen supaya rerun fragmen (cuba semula, kiraan detik, sejarah) turut dikira
 if st.session_state.last_results:
-    st.subheader(f"🔍 {len(st.session_state.last_results)} ISU REAL-TIME DIKESAN")
-    for i, entry in enumerate(st.session_state.last_results):
-        with st.expander(f"📌 {entry.title}", expanded=(i==0)):
-            st.write(f"**Sumber Berita:** {entry.get('source', {}).get('title', 'Berita Tempatan')}")
-            st.markdown(f"**Pautan Terus:** [KLIK SINI UNTUK BACA BERITA PENUH]({entry.link})")
-    
-    st.markdown("---")
-    st.subheader(f"🧠 ANALISA SENTIMEN {st.session_state.ai_engine.upper()}")
-    
-    if st.session_state.ai_analysis:
-        st.markdown(st.session_state.ai_analysis)
-    elif st.session_state.retry_active:
-        # Tunjukkan countdown di sini (Bahagian bawah)
-        st.warning(f"🚨 HAD KUOTA DICAPAI (Cubaan {st.session_state.retry_count}/3). Menunggu 30 saat untuk cuba semula secara automatik...")
-        progress_bar = st.progress(0)
-        for i in range(30):
-            time.sleep(1)
-            progress_bar.progress((i + 1) / 30)
-        st.session_state.retry_active = False # Reset supaya tidak loop di DISPLAY
-        run_ai_analysis()
-        st.rerun()
-    elif 'error_feedback' in st.session_state and st.session_state.error_feedback:
-        etype, title, msg = st.session_state.error_feedback
-        st.error(title)
-        st.info(msg)
-        # Jangan delete lagi supaya user nampak, kita delete bila Firewatch baru bermula
-        if st.button("🔄 CUBA ANALISA SEMULA"):
-            st.session_state.error_feedback = None
-            run_ai_analysis()
-            st.rerun()
-    else:
-        st.info("Analisa AI tidak tersedia buat masa ini.")
-        if st.button("🔄 CUBA ANALISA SEMULA"):
-            st.session_state.error_feedback = None
-            run_ai_analysis()
-            st.rerun()
-
+    show_results()
 else:
     st.write("Sila masukkan kata kunci di bar sisi dan klik 'Lancarkan Firewatch' untuk memulakan analisa.")
     col1, col2, col3 = st.columns(3)
@@ -310,3 +563,15 @@ else:
     2. **Pilih Sumber**: Pantau portal berita atau terus ke media sosial (TikTok/FB).
     3. **Tapis Masa**: Fokus kepada isu yang paling baru (24 jam hingga 30 hari).
     """)
+
+# --- SEJARAH & TREND (STOR TEMPATAN) ---
+st.markdown("---")
+show_history()
+
+# --- PANEL PRESTASI (BAR SISI) ---
+# Dilukis terakhir: larian yang dihidangkan sepenuhnya dari cache tidak mencetuskan rerun,
+# jadi panel yang dilukis lebih awal akan memaparkan angka larian sebelumnya
+with cache_panel.container():
+    show_cache_stats()
+with perf_panel.container():
+    show_performance_panel()
@@ -0,0 +1,194 @@
+import calendar
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from analysis import entry_key
+from dedup import source_name
+
+# --- STOR SURVEILANS TEMPATAN ---
+STORE_PATH = os.environ.get("KIF_STORE_PATH", "kif_store.sqlite3")
+
+# Sentimen bebas-teks daripada AI diseragamkan kepada tiga kategori untuk trend
+_SENTIMENT_SQL = """
+    CASE
+        WHEN lower(a.sentiment) LIKE 'neg%' THEN 'Negatif'
+        WHEN lower(a.sentiment) LIKE 'pos%' THEN 'Positif'
+        ELSE 'Neutral'
+    END
+"""
+
+
+def published_timestamp(entry):
+    parsed = entry.get("published_parsed")
+    if parsed:
+        return calendar.timegm(parsed)
+    return time.time()
+
+
+class SurveillanceStore:
+    # Stor SQLite yang ditulis oleh daemon (firewatch_daemon.py) dan dibaca oleh dashboard:
+    # seen = semua GUID yang pernah dilihat, entries = isu (wakil kelompok), analyses = keputusan AI.
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS seen (
+                    guid TEXT NOT NULL,
+                    keyword TEXT NOT NULL,
+                    seen_at REAL NOT NULL,
+                    PRIMARY KEY (keyword, guid)
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    guid TEXT NOT NULL,
+                    keyword TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    link TEXT,
+                    source TEXT,
+                    source_count INTEGER NOT NULL DEFAULT 1,
+                    matched_terms TEXT,
+                    published REAL NOT NULL,
+                    first_seen REAL NOT NULL,
+                    PRIMARY KEY (keyword, guid)
+                );
+                CREATE TABLE IF NOT EXISTS analyses (
+                    guid TEXT NOT NULL,
+                    keyword TEXT NOT NULL,
+                    engine TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    sentiment TEXT,
+                    risk INTEGER,
+                    recommendation TEXT,
+                    fact_status TEXT,
+                    analyzed_at REAL NOT NULL,
+                    PRIMARY KEY (keyword, guid)
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_published ON entries (published, keyword, guid);
+                CREATE INDEX IF NOT EXISTS idx_entries_keyword_published ON entries (keyword, published, guid);
+                CREATE INDEX IF NOT EXISTS idx_analyses_risk ON analyses (risk);
+                CREATE INDEX IF NOT EXISTS idx_analyses_lookup ON analyses (keyword, guid, risk, sentiment);
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def unseen(self, keyword, guids):
+        # Pulangkan GUID yang belum pernah dilihat bagi kata kunci ini
+        guids = list(dict.fromkeys(guids))
+        if not guids:
+            return set()
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT guid FROM seen WHERE keyword = ? AND guid IN ({','.join('?' * len(guids))})",
+                [keyword] + guids
+            ).fetchall()
+        return set(guids) - {row[0] for row in rows}
+
+    def mark_seen(self, keyword, guids):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO seen VALUES (?, ?, ?)",
+                [(guid, keyword, now) for guid in guids]
+            )
+
+    def add_entries(self, keyword, entries):
+        now = time.time()
+        rows = [(
+            entry_key(entry), keyword, entry.get("title", ""), entry.get("link"), source_name(entry),
+            len(entry.get("cluster_sources", [])) or 1, ", ".join(entry.get("watch_hits", [])),
+            published_timestamp(entry), now,
+        ) for entry in entries]
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def add_analyses(self, keyword, entries, verdicts, engine, model):
+        now = time.time()
+        rows = [(
+            entry_key(entry), keyword, engine, model, verdict.get("sentiment"), verdict.get("risk"),
+            verdict.get("recommendation"), verdict.get("fact_status"), now,
+        ) for entry, verdict in zip(entries, verdicts) if verdict is not None]
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def latest(self, limit=50):
+        return self._query("""
+            SELECT e.keyword, e.title, e.link, e.source, e.source_count, e.published,
+                   a.sentiment, a.risk, a.recommendation, a.fact_status, a.engine
+            FROM entries e
+            LEFT JOIN analyses a ON a.keyword = e.keyword AND a.guid = e.guid
+            ORDER BY e.first_seen DESC, e.published DESC
+            LIMIT ?
+        """, (limit,))
+
+    def _query(self, sql, params):
+        with self._lock, self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def keywords(self):
+        return [row["keyword"] for row in self._query("SELECT DISTINCT keyword FROM entries ORDER BY keyword", ())]
+
+    def _scope(self, days, keyword):
+        # Syarat WHERE bersama: tempoh masa (indeks published) dan kata kunci (indeks keyword, published)
+        clauses = ["e.published >= ?"]
+        params = [time.time() - days * 86400]
+        if keyword:
+            clauses.append("e.keyword = ?")
+            params.append(keyword)
+        return " AND ".join(clauses), params
+
+    def risk_trend(self, days=30, keyword=None):
+        # Purata/maksimum risiko dan bilangan isu mengikut hari
+        where, params = self._scope(days, keyword)
+        return self._query(f"""
+            SELECT date(e.published, 'unixepoch', 'localtime') AS day,
+                   COUNT(*) AS issues,
+                   ROUND(AVG(a.risk), 2) AS avg_risk,
+                   MAX(a.risk) AS max_risk
+            FROM entries e
+            JOIN analyses a ON a.keyword = e.keyword AND a.guid = e.guid
+            WHERE {where}
+            GROUP BY day
+            ORDER BY day
+        """, params)
+
+    def sentiment_trend(self, days=30, keyword=None):
+        where, params = self._scope(days, keyword)
+        return self._query(f"""
+            SELECT day,
+                   SUM(category = 'Negatif') AS Negatif,
+                   SUM(category = 'Neutral') AS Neutral,
+                   SUM(category = 'Positif') AS Positif
+            FROM (
+                SELECT date(e.published, 'unixepoch', 'localtime') AS day, {_SENTIMENT_SQL} AS category
+                FROM entries e
+                JOIN analyses a ON a.keyword = e.keyword AND a.guid = e.guid
+                WHERE {where}
+            )
+            GROUP BY day
+            ORDER BY day
+        """, params)
+
+    def top_risks(self, days=7, limit=10, keyword=None):
+        where, params = self._scope(days, keyword)
+        return self._query(f"""
+            SELECT a.risk, e.keyword, e.title, e.link, e.source, e.source_count, e.published,
+                   a.sentiment, a.recommendation, a.fact_status, a.engine
+            FROM analyses a
+            JOIN entries e ON e.keyword = a.keyword AND e.guid = a.guid
+            WHERE a.risk IS NOT NULL AND {where}
+            ORDER BY a.risk DESC, e.published DESC
+            LIMIT ?
+        """, params + [limit])
@@ -0,0 +1,105 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+import feedparser
+
+# --- PADANAN SENARAI PANTAU (WATCHLIST) ---
+# Singkatan lazim Bahasa Melayu dikembangkan pada teks dan istilah supaya kedua-duanya sepadan
+ABBREVIATIONS = {
+    "yg": "yang",
+    "dgn": "dengan",
+    "utk": "untuk",
+    "dlm": "dalam",
+    "org": "orang",
+    "sbb": "sebab",
+    "tdk": "tidak",
+    "kpd": "kepada",
+    "hosp": "hospital",
+    "kkm": "kementerian kesihatan malaysia",
+    "jkn": "jabatan kesihatan negeri",
+    "kk": "klinik kesihatan",
+    "pkd": "pejabat kesihatan daerah",
+}
+
+_TAGS = re.compile(r"<[^>]+>")
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFKD", _TAGS.sub(" ", text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    words = _NON_WORD.sub(" ", text.casefold()).split()
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def parse_watchlist(text):
+    # Satu istilah sebaris; ejaan alternatif dipisahkan dengan "|" (istilah pertama = nama paparan)
+    terms = []
+    for line in (text or "").splitlines():
+        variants = tuple(v.strip() for v in line.split("|") if v.strip())
+        if variants:
+            terms.append(variants)
+    return terms
+
+
+def _trie_pattern(node):
+    # Bina regex daripada trie supaya ratusan istilah tidak menyebabkan backtracking berulang
+    if "" in node and len(node) == 1:
+        return ""
+    branches = []
+    optional = False
+    for char, child in sorted(node.items()):
+        if char == "":
+            optional = True
+            continue
+        branches.append(re.escape(char) + _trie_pattern(child))
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if optional:
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+
+class WatchlistMatcher:
+    def __init__(self, terms):
+        self.lookup = {}  # varian ternormal -> istilah paparan
+        trie = {}
+        for variants in terms:
+            for variant in variants:
+                normalized = normalize_text(variant)
+                if not normalized:
+                    continue
+                self.lookup.setdefault(normalized, variants[0])
+                node = trie
+                for char in normalized:
+                    node = node.setdefault(char, {})
+                node[""] = {}
+        self.pattern = re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)") if trie else None
+
+    def matches(self, text):
+        # Pulangkan istilah (nama paparan) yang muncul dalam teks, mengikut susunan pertama dijumpai
+        if self.pattern is None:
+            return []
+        hits = []
+        for match in self.pattern.finditer(normalize_text(text)):
+            term = self.lookup.get(match.group(0))
+            if term is not None and term not in hits:
+                hits.append(term)
+        return hits
+
+    def filter_entries(self, entries):
+        # Salinan entri yang sepadan, dengan istilah yang dijumpai dalam kunci "watch_hits"
+        matched = []
+        for entry in entries:
+            hits = self.matches(f"{entry.get('title', '')} \n {entry.get('summary', '')}")
+            if hits:
+                copy = feedparser.FeedParserDict(entry)
+                copy["watch_hits"] = hits
+                matched.append(copy)
+        return matched
+
+
+@lru_cache(maxsize=64)
+def get_matcher(terms):
+    # terms: tuple of tuples (boleh di-hash) supaya matcher dibina sekali dan digunakan semula
+    return WatchlistMatcher(terms)